@@ -8,6 +8,9 @@ facilities that are marked as geocoded but are missing latitude and longitude.
 import logging
 import sys
 
+import numpy as np
+from sqlalchemy.orm import Session
+
 from app import app, db
 from models import MedicalFacility, Region
 
@@ -52,18 +55,24 @@ REGION_DEFAULT_COORDINATES = {
 # A default fallback for unknown regions
 DEFAULT_COORDINATES = (41.90, 12.49)  # Rome/center of Italy
 
+# Number of facilities fetched, updated and committed per batch
+BATCH_SIZE = 1000
+
 def get_stats():
     """Get geocoding statistics"""
-    total = db.session.query(MedicalFacility).count()
-    geocoded = db.session.query(MedicalFacility).filter(MedicalFacility.geocoded == True).count()
-    with_coords = db.session.query(MedicalFacility).filter(
-        MedicalFacility.latitude != None,
-        MedicalFacility.longitude != None
-    ).count()
-    missing = db.session.query(MedicalFacility).filter(
-        MedicalFacility.geocoded == True,
-        MedicalFacility.latitude.is_(None)
-    ).count()
+    # Collect all counters in a single scan using conditional aggregates
+    total, geocoded, with_coords, missing = db.session.query(
+        db.func.count(MedicalFacility.id),
+        db.func.count(MedicalFacility.id).filter(MedicalFacility.geocoded == True),
+        db.func.count(MedicalFacility.id).filter(
+            MedicalFacility.latitude != None,
+            MedicalFacility.longitude != None
+        ),
+        db.func.count(MedicalFacility.id).filter(
+            MedicalFacility.geocoded == True,
+            MedicalFacility.latitude.is_(None)
+        )
+    ).one()
     
     logger.info(f"Total facilities: {total}")
     logger.info(f"Geocoded facilities: {geocoded} ({geocoded/total*100:.1f}%)")
@@ -95,47 +104,84 @@ def add_default_coordinates():
             logger.info("No facilities with missing coordinates found!")
             return 0
         
-        # Get all facilities missing coordinates
-        facilities = db.session.query(MedicalFacility).filter(
-            MedicalFacility.geocoded == True,
-            MedicalFacility.latitude.is_(None)
-        ).all()
+        logger.info(f"Processing {stats_before['missing']} facilities with missing coordinates")
         
-        logger.info(f"Processing {len(facilities)} facilities with missing coordinates")
-        
-        # Create a mapping of region IDs to region names
-        regions = db.session.query(Region).all()
-        region_map = {region.id: region.name for region in regions}
-        
-        updated_count = 0
-        
-        for facility in facilities:
-            region_name = region_map.get(facility.region_id, None)
+        # Dedicated session that does not expire the loaded rows on commit
+        with Session(db.engine, expire_on_commit=False) as session:
+            # Create a mapping of region IDs to region names
+            regions = session.query(Region).all()
+            region_map = {region.id: region.name for region in regions}
             
-            logger.info(f"Processing facility {facility.id}: {facility.name} (Region: {region_name})")
+            # Precompute the default coordinates of every region in an array indexed
+            # by region ID; the extra last row is used for unknown regions
+            max_region_id = max(region_map, default=0)
+            unknown_region_idx = max_region_id + 1
+            region_coords = np.tile(np.array(DEFAULT_COORDINATES, dtype=float), (max_region_id + 2, 1))
+            for region_id, region_name in region_map.items():
+                region_coords[region_id] = get_region_coordinates(region_name)
             
-            # Get default coordinates for this region
-            lat, lon = get_region_coordinates(region_name)
+            # Page through the facilities missing coordinates (only the columns we need)
+            # by id: each batch is read completely before its rows are updated, so no
+            # cursor is left open on the table while it changes
+            missing_query = db.select(
+                MedicalFacility.id,
+                MedicalFacility.name,
+                MedicalFacility.region_id
+            ).where(
+                MedicalFacility.geocoded == True,
+                MedicalFacility.latitude.is_(None)
+            ).order_by(MedicalFacility.id).limit(BATCH_SIZE)
             
-            # Add a small random offset (±0.05 degrees) to avoid all facilities
-            # in the same region appearing at exactly the same point
-            import random
-            lat_offset = random.uniform(-0.05, 0.05)
-            lon_offset = random.uniform(-0.05, 0.05)
+            rng = np.random.default_rng()
+            updated_count = 0
+            last_id = 0
             
-            facility.latitude = lat + lat_offset
-            facility.longitude = lon + lon_offset
-            
-            updated_count += 1
-        
-        # Commit all changes at once
-        try:
-            db.session.commit()
-            logger.info(f"Successfully updated {updated_count} facilities")
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Error updating facilities: {str(e)}")
-            return 1
+            try:
+                while True:
+                    facilities = session.execute(
+                        missing_query.where(MedicalFacility.id > last_id)
+                    ).all()
+                    if not facilities:
+                        break
+                    last_id = facilities[-1].id
+                    
+                    # Default coordinates for each facility, gathered from the region array
+                    region_idx = np.array(
+                        [f.region_id if f.region_id in region_map else unknown_region_idx for f in facilities],
+                        dtype=np.intp
+                    )
+                    base_coords = region_coords[region_idx]
+                    
+                    # Add a small random offset (±0.05 degrees) to avoid all facilities
+                    # in the same region appearing at exactly the same point
+                    offsets = rng.uniform(-0.05, 0.05, size=(len(facilities), 2))
+                    coords = base_coords + offsets
+                    
+                    # Collect the new coordinates and write them back with a single bulk UPDATE
+                    mappings = []
+                    
+                    for facility, (lat, lon) in zip(facilities, coords.tolist()):
+                        logger.debug("Processing facility %s: %s (Region: %s)",
+                                     facility.id, facility.name, region_map.get(facility.region_id))
+                        
+                        mappings.append({
+                            'id': facility.id,
+                            'latitude': lat,
+                            'longitude': lon
+                        })
+                    
+                    session.bulk_update_mappings(MedicalFacility, mappings)
+                    
+                    # Commit each batch, so that an error only loses the current one
+                    session.commit()
+                    updated_count += len(mappings)
+                    logger.info(f"Processed {updated_count}/{stats_before['missing']} facilities")
+                
+                logger.info(f"Successfully updated {updated_count} facilities")
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error updating facilities: {str(e)}")
+                return 1
         
         # Get statistics after processing
         logger.info("Getting statistics after processing...")
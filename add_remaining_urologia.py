@@ -9,7 +9,7 @@ import csv
 import logging
 from datetime import datetime
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import sessionmaker
 from app import app, db
 from models import MedicalFacility, Specialty, FacilitySpecialty
 
@@ -18,6 +18,10 @@ logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Factory condivisa per le sessioni dello script, creata una sola volta
+with app.app_context():
+    SessionFactory = sessionmaker(bind=db.engine, expire_on_commit=False)
+
 # Mappatura manuale delle strutture rimanenti con i nomi nel CSV
 facility_manual_mapping = {
     "Ospedale Morgagni - Pierantoni": "Ospedale Morgagni",
@@ -40,12 +44,15 @@ def find_urologia_ratings(csv_file):
     ratings = {}
     
     with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        # Risolvi una sola volta gli indici delle colonne dall'intestazione
+        header = next(reader)
+        name_idx = header.index('Name of the facility')
+        urologia_idx = header.index('Urologia')
         for row in reader:
-            facility_name = row['Name of the facility']
-            urologia_rating = row['Urologia'].strip()
+            urologia_rating = row[urologia_idx].strip()
             if urologia_rating:
-                ratings[facility_name] = float(urologia_rating)
+                ratings[row[name_idx]] = float(urologia_rating)
     
     return ratings
 
@@ -63,49 +70,75 @@ def add_remaining_urologia_ratings(csv_file):
     urologia_id = 791
     
     with app.app_context():
-        with Session(db.engine) as session:
+        with SessionFactory() as session:
             # Verifica che l'ID di Urologia sia corretto
             specialty = session.query(Specialty).filter_by(id=urologia_id).first()
             if not specialty or specialty.name != 'Urologia':
                 logger.error(f"Specialità Urologia non trovata con ID {urologia_id}")
                 return
             
-            # Elabora ogni struttura nella mappatura manuale
-            for db_name, csv_name in facility_manual_mapping.items():
-                # Cerca la struttura nel database
-                facility = session.query(MedicalFacility).filter(
-                    MedicalFacility.name.ilike(f"{db_name}%")
-                ).first()
-                
-                if not facility:
-                    logger.error(f"Struttura non trovata: {db_name}")
-                    continue
-                
-                # Cerca la valutazione nel CSV
-                if csv_name not in ratings:
-                    logger.error(f"Valutazione non trovata per: {csv_name}")
-                    continue
+            # Nessun flush automatico mentre si leggono le strutture e si preparano le nuove righe
+            with session.no_autoflush:
+                # Carica in un'unica query (solo id e nome) tutte le strutture della mappatura manuale
+                prefixes = list(facility_manual_mapping.keys())
+                candidates = session.execute(
+                    text(
+                        "SELECT id, name FROM medical_facilities WHERE "
+                        + " OR ".join(f"name ILIKE :p{i}" for i in range(len(prefixes)))
+                        + " ORDER BY id"
+                    ),
+                    {f"p{i}": f"{prefix}%" for i, prefix in enumerate(prefixes)}
+                ).all()
                 
-                rating = ratings[csv_name]
+                facilities_by_prefix = {}
+                for prefix in prefixes:
+                    for candidate in candidates:
+                        if candidate.name.lower().startswith(prefix.lower()):
+                            facilities_by_prefix[prefix] = candidate
+                            break
                 
-                # Controlla se esiste già una valutazione per questa struttura
-                existing = session.query(FacilitySpecialty).filter_by(
-                    facility_id=facility.id,
-                    specialty_id=urologia_id
-                ).first()
+                # Carica in un'unica query le valutazioni di Urologia già presenti
+                facility_ids = [f.id for f in facilities_by_prefix.values()]
+                existing_ratings = {
+                    fs.facility_id: fs for fs in session.query(FacilitySpecialty).filter(
+                        FacilitySpecialty.facility_id.in_(facility_ids),
+                        FacilitySpecialty.specialty_id == urologia_id
+                    ).all()
+                }
                 
-                if existing:
-                    logger.info(f"La struttura {db_name} ha già una valutazione per Urologia: {existing.quality_rating}")
-                    continue
+                # Elabora ogni struttura nella mappatura manuale
+                new_rows = []
+                for db_name, csv_name in facility_manual_mapping.items():
+                    facility = facilities_by_prefix.get(db_name)
+                    
+                    if not facility:
+                        logger.error(f"Struttura non trovata: {db_name}")
+                        continue
+                    
+                    # Cerca la valutazione nel CSV
+                    if csv_name not in ratings:
+                        logger.error(f"Valutazione non trovata per: {csv_name}")
+                        continue
+                    
+                    rating = ratings[csv_name]
+                    
+                    # Controlla se esiste già una valutazione per questa struttura
+                    existing = existing_ratings.get(facility.id)
+                    
+                    if existing:
+                        logger.info(f"La struttura {db_name} ha già una valutazione per Urologia: {existing.quality_rating}")
+                        continue
+                    
+                    # Crea una nuova associazione
+                    new_rows.append({
+                        'facility_id': facility.id,
+                        'specialty_id': urologia_id,
+                        'quality_rating': rating
+                    })
+                    logger.info(f"Aggiunta valutazione {rating} per Urologia a {db_name} (ID: {facility.id})")
                 
-                # Crea una nuova associazione
-                new_rating = FacilitySpecialty(
-                    facility_id=facility.id,
-                    specialty_id=urologia_id,
-                    quality_rating=rating
-                )
-                session.add(new_rating)
-                logger.info(f"Aggiunta valutazione {rating} per Urologia a {db_name} (ID: {facility.id})")
+                # Inserisci tutte le nuove valutazioni in un'unica operazione
+                session.bulk_insert_mappings(FacilitySpecialty, new_rows)
             
             # Salva le modifiche
             session.commit()
@@ -116,14 +149,16 @@ def add_remaining_urologia_ratings(csv_file):
 def update_database_status(message):
     """Aggiorna lo stato del database"""
     try:
-        with Session(db.engine) as session:
+        with SessionFactory() as session:
             timestamp = datetime.now()
+            # Aggiorna lo stato e scrivi il log con un'unica istruzione (CTE)
             session.execute(
-                text("UPDATE database_status SET status = :status, last_updated = :timestamp"),
-                {"status": "updated", "timestamp": timestamp}
-            )
-            session.execute(
-                text("INSERT INTO database_status_log (status, message, timestamp) VALUES (:status, :message, :timestamp)"),
+                text(
+                    "WITH updated AS ("
+                    "UPDATE database_status SET status = :status, last_updated = :timestamp RETURNING 1"
+                    ") "
+                    "INSERT INTO database_status_log (status, message, timestamp) VALUES (:status, :message, :timestamp)"
+                ),
                 {"status": "updated", "message": message, "timestamp": timestamp}
             )
             session.commit()
@@ -1,13 +1,37 @@
 import os
 import re
+import math
+import heapq
+import sys
+import uuid
+import subprocess
+import time
+import threading
 import logging
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, send_file
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from flask import Flask, render_template, stream_template, request, jsonify, flash, redirect, url_for, send_file, session, make_response, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from jinja2.utils import htmlsafe_json_dumps
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import event, lambda_stmt
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm import DeclarativeBase, joinedload, selectinload, defer, make_transient_to_detached
 from werkzeug.middleware.proxy_fix import ProxyFix
 from medical_mapping import map_query_to_specialties
-from medical_professionals import map_profession_to_specialties, PROFESSION_TO_SPECIALTY_MAP
-from geocoding import is_address_query, extract_address_part, find_facilities_near_address, calculate_distance
+from medical_professionals import map_profession_to_specialties, find_profession_term, PROFESSION_TO_SPECIALTY_MAP
+from specialty_mapping import get_equivalent_specialties
+from location_mapping import CITY_TO_REGION_MAP
+from geocoding import is_address_query, extract_address_part, find_facilities_near_address, calculate_distance, parse_address, geocode_address
+from export_database import iter_database_zip
+
+# orjson is optional: when installed it replaces the stdlib json module for
+# jsonify() responses and the tojson template filter
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -18,19 +42,118 @@ class Base(DeclarativeBase):
     pass
 
 # Initialize SQLAlchemy
-db = SQLAlchemy(model_class=Base)
+# Keep the loaded attributes after commit: the objects are read again (e.g. to
+# render or log them) right after the data loading and geocoding commits
+db = SQLAlchemy(model_class=Base, session_options={"expire_on_commit": False})
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider serializing with orjson (several times faster on large payloads)"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+@dataclass(slots=True, frozen=True)
+class SearchParams:
+    """Search parameters parsed once from the query string of /search and /search.json"""
+    specialty: str = ''
+    region: str = ''
+    min_quality: float = 0.0
+    query_text: str = ''
+    sort_by: str = 'quality_desc'  # Default sort by quality descending
+    # Coordinates provided by the autocomplete
+    latitude: str = ''
+    longitude: str = ''
+    is_address_search: bool = False
+    search_radius: float = 30.0
+
+    @classmethod
+    def from_args(cls, args):
+        """
+        Parse and validate the search parameters.
+        
+        Args:
+            args: The query string parameters (request.args)
+        
+        Returns:
+            SearchParams: The parsed parameters, with defaults for missing or invalid values
+        """
+        # Custom search radius, limited between 5km and 300km (default 30km)
+        try:
+            search_radius = max(5.0, min(300.0, float(args.get('radius', 30.0))))
+        except (ValueError, TypeError):
+            search_radius = 30.0
+
+        return cls(
+            specialty=args.get('specialty', ''),
+            region=args.get('region', ''),
+            min_quality=args.get('min_quality', 0, type=float),
+            query_text=args.get('query_text', ''),
+            sort_by=args.get('sort_by', 'quality_desc'),
+            latitude=args.get('latitude', ''),
+            longitude=args.get('longitude', ''),
+            is_address_search=args.get('is_address_search', 'false').lower() == 'true',
+            search_radius=search_radius,
+        )
 
 # Create Flask app
 app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+app.secret_key = os.environ.get("SESSION_SECRET")
+if not app.secret_key:
+    # A fallback key in a deployment would invalidate sessions on every restart
+    # (and make them forgeable): require the secret there
+    if os.environ.get("REPLIT_DEPLOYMENT"):
+        raise RuntimeError("SESSION_SECRET must be set in production")
+    app.secret_key = "dev_secret_key"
+# Trust one proxy for client IP, scheme, host and path prefix
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
 # Configure the database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///medical_facilities.db")
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
+    # Fold bulk inserts into multi-row INSERT ... VALUES statements
+    "insertmanyvalues_page_size": 1000,
+    # Compiled statement cache: the search builds one statement shape per
+    # combination of filters and keyword count, keep them all compiled
+    "query_cache_size": 1200,
+    # Connections per process: a gthread worker runs GUNICORN_THREADS requests
+    # at once and each holds at most one connection. The pool is per process, so
+    # the total is (pool_size + max_overflow) x workers and must stay below
+    # PostgreSQL's max_connections (100 by default). Fail fast instead of
+    # queueing requests when the pool is exhausted
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", os.environ.get("GUNICORN_THREADS", 4))),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 2)),
+    "pool_timeout": 5,
+    # Log pool checkouts/checkins when profiling connection usage
+    "echo_pool": "debug" if os.environ.get("SQLALCHEMY_ECHO_POOL") else False,
 }
+# Maintenance scripts (python some_script.py) are short-lived and run in a
+# single process: skip the SELECT 1 issued on every pool checkout
+entry_point = os.path.basename(sys.argv[0])
+is_script = entry_point.endswith(".py") and entry_point != "main.py"
+if is_script:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["pool_pre_ping"] = False
+if app.config["SQLALCHEMY_DATABASE_URI"].startswith("postgresql"):
+    # psycopg2 fast execution helpers for executemany() (UPDATE/DELETE batches too)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"].update({
+        "executemany_mode": "values_plus_batch",
+        "executemany_batch_page_size": 500,
+    })
+    if not is_script:
+        # Bound the worst-case query time of web requests (scripts and data
+        # loads legitimately run long statements)
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = {
+            "options": f"-c statement_timeout={os.environ.get('DB_STATEMENT_TIMEOUT_MS', 3000)}"
+        }
+elif app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    # Wait at most 3 seconds for a locked database
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = {"timeout": 3}
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # Initialize the app with the extension
@@ -38,35 +161,221 @@ db.init_app(app)
 
 # Import routes after app initialization to avoid circular imports
 with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        @event.listens_for(db.engine, "connect")
+        def _set_sqlite_pragma(dbapi_connection, connection_record):
+            """Let the searches read while a data load or geocoding run is writing"""
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
     # Import models and create tables
-    from models import MedicalFacility, Specialty, FacilitySpecialty, Region, DatabaseStatus
+    from models import MedicalFacility, Specialty, FacilitySpecialty, Region, DatabaseStatus, BackgroundJob, IS_POSTGRESQL
     db.create_all()
 
     # Import and register route functions
-    from data_loader import load_data, get_regions, get_specialties, normalize_specialty
+    import data_loader
+    from data_loader import normalize_specialty
+
+    # Process-local cache for reference data that only changes when data is
+    # (re)loaded. Maps a key to a (value, expires_at) tuple.
+    CACHE_TTL = 300  # seconds
+    _cache = {}
+    # Serializes the reloads of expired entries: with threaded workers only one
+    # request runs the query, the others wait for it and reuse its result.
+    # Reentrant, because some loaders read other cached values (the home page
+    # renders the cached regions, specialties and status)
+    _cache_lock = threading.RLock()
+
+    # The data can change in other processes (background loads, maintenance
+    # scripts), which all record a new DatabaseStatus row: every few seconds
+    # the cache compares the latest status id and drops everything when it moved
+    DATA_VERSION_CHECK_INTERVAL = 5  # seconds
+    _data_version = {'value': None, 'checked_at': float('-inf')}
+
+    def _check_data_version():
+        """Clear the cache if the data changed since the last check"""
+        if time.monotonic() < _data_version['checked_at'] + DATA_VERSION_CHECK_INTERVAL:
+            return
+        with _cache_lock:
+            now = time.monotonic()
+            if now < _data_version['checked_at'] + DATA_VERSION_CHECK_INTERVAL:
+                return
+            _data_version['checked_at'] = now
+            try:
+                version = DatabaseStatus.get_version()
+            except SQLAlchemyError as e:
+                logger.error(f"Error checking the data version: {str(e)}")
+                db.session.rollback()
+                return
+            if version != _data_version['value']:
+                _cache.clear()
+                _data_version['value'] = version
+
+    def cached(key, loader, ttl=CACHE_TTL):
+        """Return the cached value for key, calling loader() when missing or expired"""
+        _check_data_version()
+        entry = _cache.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        with _cache_lock:
+            # Another thread may have reloaded the entry while we waited
+            entry = _cache.get(key)
+            now = time.monotonic()
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            value = loader()
+            _cache[key] = (value, now + ttl)
+            return value
+
+    # Background processes started by this worker, by job id. The job status
+    # itself is stored in the database (BackgroundJob) for all the workers;
+    # this only lets the starting worker reap its children and notice crashes
+    _processes = {}
+
+    def _reap_processes():
+        """Collect the exited child processes, recording the ones that died without reporting"""
+        for job_id, process in list(_processes.items()):
+            returncode = process.poll()
+            if returncode is not None:
+                del _processes[job_id]
+                # No-op when the job already recorded its own outcome
+                BackgroundJob.finish(job_id, returncode == 0)
+
+    def start_job(kind, cmd, log_file, **details):
+        """
+        Run a command in a background process and register it for /job-status.
+        
+        The command is given --job-id and records its outcome in BackgroundJob
+        when it ends.
+        
+        Args:
+            kind: What the job does, shown by the data manager page
+            cmd: The command to run
+            log_file: The log file the command writes to
+            **details: Extra fields returned by /job-status
+        
+        Returns:
+            str: The job id
+        """
+        job_id = uuid.uuid4().hex
+        BackgroundJob.start(job_id, kind, log_file, details)
+        try:
+            _processes[job_id] = subprocess.Popen(cmd + ['--job-id', job_id])
+        except OSError:
+            BackgroundJob.finish(job_id, False)
+            raise
+        return job_id
+
+    def _load_reference_data():
+        """
+        Load all regions and specialties, sorted by name, with a single query.
+        
+        Both tables only hold (id, name): a UNION ALL of the two reads them in
+        one round trip, and the rows are turned into detached instances that
+        can be shared across requests.
+        
+        Returns:
+            dict: {'regions': [Region, ...], 'specialties': [Specialty, ...]}
+        """
+        rows = db.session.execute(
+            db.union_all(
+                db.select(db.literal('regions').label('kind'), Region.id, Region.name),
+                db.select(db.literal('specialties').label('kind'), Specialty.id, Specialty.name),
+            ).order_by('kind', 'name')
+        ).all()
+        
+        data = {'regions': [], 'specialties': []}
+        models_by_kind = {'regions': Region, 'specialties': Specialty}
+        for row in rows:
+            obj = models_by_kind[row.kind](id=row.id, name=row.name)
+            make_transient_to_detached(obj)
+            data[row.kind].append(obj)
+        return data
+
+    def get_regions():
+        """Get all regions from the database (cached)"""
+        return cached('reference_data', _load_reference_data)['regions']
+
+    def get_specialties():
+        """Get all specialties from the database (cached)"""
+        return cached('reference_data', _load_reference_data)['specialties']
+
+    def get_specialty_names():
+        """Get the names of all the specialties in the database (cached)"""
+        return cached('specialty_names', lambda: frozenset(s.name for s in get_specialties()))
+
+    # Relationships rendered for every facility in the search results; loading
+    # them up front avoids one lazy SELECT per facility while rendering.
+    # The region (many-to-one) rides along in the main query with a LEFT JOIN;
+    # the specialties collection comes from one extra IN query (joining each
+    # FacilitySpecialty to its Specialty), which avoids multiplying the rows.
+    # The columns the results never show (import bookkeeping and, on
+    # PostgreSQL, the denormalized specialty_names array) are left out of the SELECT
+    FACILITY_RESULT_OPTIONS = (
+        joinedload(MedicalFacility.region),
+        selectinload(MedicalFacility.specialties).joinedload(FacilitySpecialty.specialty),
+        defer(MedicalFacility.postal_code),
+        defer(MedicalFacility.geocoded),
+        defer(MedicalFacility.data_source),
+        defer(MedicalFacility.attribution),
+    )
+    if IS_POSTGRESQL:
+        FACILITY_RESULT_OPTIONS += (defer(MedicalFacility.specialty_names),)
+
+    # The status changes more often than regions/specialties (e.g. data loads
+    # from other processes), so it is kept for a shorter time
+    DATABASE_STATUS_TTL = 30  # seconds
+
+    def _load_database_status():
+        """Load the latest DatabaseStatus row, detached so it can be cached"""
+        status = DatabaseStatus.get_status()
+        if status:
+            db.session.expunge(status)
+        return status
 
     # Check database status
     def get_database_status():
-        """Get the current database status"""
+        """Get the current database status (cached)"""
         try:
-            status = DatabaseStatus.get_status()
+            status = cached('database_status', _load_database_status, ttl=DATABASE_STATUS_TTL)
             if status:
                 logger.info(f"Database status: {status.status} (Last updated: {status.last_updated})")
                 return status
             else:
                 logger.warning("No database status found. Database may not be initialized.")
                 return None
-        except Exception as e:
+        except SQLAlchemyError as e:
             logger.error(f"Error getting database status: {str(e)}")
             return None
 
-    @app.route('/')
-    def index():
+    def _render_index():
         regions = get_regions()
         specialties = get_specialties()
         db_status = get_database_status()
         return render_template('index.html', regions=regions, specialties=specialties, db_status=db_status)
 
+    @app.route('/')
+    def index():
+        # The home page only changes with the data (and the status shown on it):
+        # serve the rendered HTML from the cache, unless there are flashed
+        # messages to show or a query string that ends up in the page URLs
+        has_flashes = '_flashes' in session
+        if has_flashes or request.query_string:
+            html = _render_index()
+        else:
+            html = cached('index_html', _render_index, ttl=DATABASE_STATUS_TTL)
+        
+        # ETag so that browsers revalidating the page get a 304 without the body
+        response = make_response(html)
+        response.add_etag()
+        if not has_flashes:
+            # Let browsers and shared caches keep the page for a minute
+            response.cache_control.public = True
+            response.cache_control.max_age = 60
+        return response.make_conditional(request)
+
     # Helper function to get specialty-specific score for a facility
     def get_specialty_score(facility, specialty_name):
         """
@@ -88,28 +397,31 @@ with app.app_context():
         # Normalize specialty name to lowercase for matching
         normalized_specialty = specialty_name.lower()
         
+        # Lowercase each of the facility's specialty names once for all the checks below
+        facility_specialties = [(fs.specialty.name.lower(), fs.quality_rating) for fs in facility.specialties]
+        
         # Prima priorità: strutture con rating specifico per la specialità cercata
-        for fs in facility.specialties:
+        for name, quality_rating in facility_specialties:
             # Verifica una corrispondenza esatta con la specialità cercata
-            if fs.specialty.name.lower() == normalized_specialty and fs.quality_rating is not None:
+            if name == normalized_specialty and quality_rating is not None:
                 # Trovato rating specifico per la specialità, restituiscilo con alta priorità
-                return fs.quality_rating + 10.0  # Aggiungi 10 punti per assicurarsi che appaiano per primi
+                return quality_rating + 10.0  # Aggiungi 10 punti per assicurarsi che appaiano per primi
         
         # Seconda priorità: strutture che hanno specialità simili con rating specifici
         # Supporto per specialità che contengono il termine cercato, o viceversa
-        for fs in facility.specialties:
-            if ((normalized_specialty in fs.specialty.name.lower() or 
-                 fs.specialty.name.lower() in normalized_specialty) and 
-                fs.quality_rating is not None):
+        for name, quality_rating in facility_specialties:
+            if ((normalized_specialty in name or 
+                 name in normalized_specialty) and 
+                quality_rating is not None):
                 # Trovata una specialità correlata con rating specifico
-                return fs.quality_rating + 7.0  # Aggiungi 7 punti (leggermente meno della prima priorità)
+                return quality_rating + 7.0  # Aggiungi 7 punti (leggermente meno della prima priorità)
         
         # Terza priorità: strutture che hanno la specialità ma senza rating specifico
         has_specialty = False
-        for fs in facility.specialties:
-            if (fs.specialty.name.lower() == normalized_specialty or
-                normalized_specialty in fs.specialty.name.lower() or
-                fs.specialty.name.lower() in normalized_specialty):
+        for name, quality_rating in facility_specialties:
+            if (name == normalized_specialty or
+                normalized_specialty in name or
+                name in normalized_specialty):
                 has_specialty = True
                 break
         
@@ -136,42 +448,350 @@ with app.app_context():
         if not specialty_name:
             return []
             
-        from specialty_mapping import get_equivalent_specialties
         specialties = get_equivalent_specialties(specialty_name)
         return specialties if specialties else []
 
-    @app.route('/search')
-    def search():
-        # Import geocoding functions at the beginning to avoid UnboundLocalError
-        from geocoding import extract_address_part, is_address_query, find_facilities_near_address, calculate_distance, parse_address, geocode_address
+    # Helper function to expand mapped specialties to their database names
+    @lru_cache(maxsize=1024)
+    def expand_specialties(specialty_names):
+        """
+        Expand specialty names to include their equivalent database specialties.
         
-        # Get search parameters
-        specialty = request.args.get('specialty', '')
-        region = request.args.get('region', '')
-        min_quality = request.args.get('min_quality', 0, type=float)
-        query_text = request.args.get('query_text', '')
-        sort_by = request.args.get('sort_by', 'quality_desc')  # Default sort by quality descending
+        The mappings are static, so the expansion is cached per tuple of names.
         
-        # Get latitude and longitude if provided by the autocomplete
-        latitude = request.args.get('latitude', '', type=str)
-        longitude = request.args.get('longitude', '', type=str)
+        Args:
+            specialty_names: Tuple of specialty names (e.g. from the query mapping)
         
-        # Get the is_address_search parameter from the form if it exists
-        is_address_search = request.args.get('is_address_search', 'false').lower() == 'true'
+        Returns:
+            tuple: The equivalent specialty names, or the name itself when it has no mapping
+        """
+        expanded_specialties = []
+        for s in specialty_names:
+            equiv_specs = get_equivalent_specialties(s)
+            if equiv_specs:
+                expanded_specialties.extend(equiv_specs)
+            else:
+                expanded_specialties.append(s)
+        return tuple(expanded_specialties)
+
+    # Expanded specialties of every profession term, computed once at startup:
+    # both mappings are static
+    PROFESSION_TO_EXPANDED_SPECIALTIES = {
+        term: expand_specialties(tuple(specialties))
+        for term, specialties in PROFESSION_TO_SPECIALTY_MAP.items()
+    }
+
+    # Helper function to compute the coordinate bounds of a search circle
+    def bounding_box(latitude, longitude, radius):
+        """
+        Compute the latitude/longitude bounding box of a circle.
         
-        # Get custom search radius if provided, default to 30km
-        try:
-            # Log the radius parameter for debugging
-            radius_param = request.args.get('radius')
-            logger.debug(f"Received radius parameter: {radius_param}")
-            
-            search_radius = float(request.args.get('radius', 30.0))
-            # Limit radius between 5km and 300km
-            search_radius = max(5.0, min(300.0, search_radius))
-            logger.debug(f"Using search radius: {search_radius} km")
-        except (ValueError, TypeError):
-            search_radius = 30.0  # Default if invalid
-            logger.debug(f"Invalid radius value, using default: {search_radius} km")
+        Args:
+            latitude: Latitude of the center
+            longitude: Longitude of the center
+            radius: Radius in km
+        
+        Returns:
+            tuple: (min_lat, max_lat, min_lon, max_lon)
+        """
+        # One degree of latitude is ~111 km; use a slightly smaller value so
+        # the box always contains the whole circle
+        delta_lat = radius / 110.0
+        delta_lon = radius / (110.0 * math.cos(math.radians(latitude)))
+        return latitude - delta_lat, latitude + delta_lat, longitude - delta_lon, longitude + delta_lon
+
+    # Helper function to find the facilities within a radius from a point
+    def facilities_within_radius(latitude, longitude, radius):
+        """
+        Find the facilities within the given radius from a point, sorted by distance.
+        
+        Distances are computed on lightweight (id, latitude, longitude) rows
+        from the bounding box of the circle; only the matching facilities are
+        then loaded as full objects.
+        
+        Args:
+            latitude: Latitude of the search point
+            longitude: Longitude of the search point
+            radius: Maximum distance in km
+        
+        Returns:
+            list: MedicalFacility objects with distance and distance_text set
+        """
+        # Only the rows inside the bounding box of the circle (ix_facility_coordinates)
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius)
+        
+        # Fixed statement shape: as a lambda statement it is built only once, later
+        # calls reuse it straight from the statement cache with the new bounds
+        rows = db.session.execute(lambda_stmt(
+            lambda: db.select(MedicalFacility.id, MedicalFacility.latitude, MedicalFacility.longitude)
+            .where(MedicalFacility.latitude.between(min_lat, max_lat),
+                   MedicalFacility.longitude.between(min_lon, max_lon))
+        )).all()
+        
+        distances = {}
+        for row in rows:
+            if row.latitude and row.longitude:
+                distance = calculate_distance(latitude, longitude, row.latitude, row.longitude)
+                if distance <= radius:
+                    distances[row.id] = round(distance, 1)
+        
+        if not distances:
+            return []
+        
+        facilities = db.session.query(MedicalFacility).options(*FACILITY_RESULT_OPTIONS).filter(
+            MedicalFacility.id.in_(distances.keys())
+        ).all()
+        for facility in facilities:
+            # Add distance directly to the facility object
+            facility.distance = distances[facility.id]
+            facility.distance_text = f"{facility.distance:.1f} km"
+        
+        # Sort by distance
+        facilities.sort(key=lambda x: x.distance)
+        return facilities
+
+    # Helper function to filter facilities by region
+    def in_region(region):
+        """
+        Build a condition matching the facilities of the regions whose name contains region.
+        
+        The name match (case-insensitive, as the former ILIKE '%region%') is
+        resolved against the cached regions, so the query filters on the
+        facility's own region_id instead of joining the regions table.
+        
+        Args:
+            region: The region name, or part of it
+        
+        Returns:
+            The SQLAlchemy filter condition
+        """
+        region_lower = region.lower()
+        region_ids = [r.id for r in get_regions() if region_lower in r.name.lower()]
+        return MedicalFacility.region_id.in_(region_ids)
+
+    # Helper function to load the facilities an address search has to look at
+    def address_candidates(latitude, longitude, radius, city_name=None):
+        """
+        Load the candidate facilities of an address search.
+        
+        Only the facilities inside the bounding box of the search circle are
+        loaded (the exact distance is checked afterwards); for a city search
+        also the facilities of that city, matched by name whatever their
+        coordinates, and those of its region, used when the city has none.
+        
+        Args:
+            latitude: Latitude of the search point
+            longitude: Longitude of the search point
+            radius: Maximum distance in km
+            city_name: The searched city (lowercase), or None
+        
+        Returns:
+            list: MedicalFacility objects with their region loaded
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius)
+        conditions = [db.and_(
+            MedicalFacility.latitude.between(min_lat, max_lat),
+            MedicalFacility.longitude.between(min_lon, max_lon)
+        )]
+        if city_name:
+            conditions.append(MedicalFacility.city.ilike(f'%{city_name}%'))
+            region_name = CITY_TO_REGION_MAP.get(city_name)
+            if region_name:
+                conditions.append(MedicalFacility.region.has(Region.name == region_name))
+        
+        # Regions loaded up front: the address matching compares region names
+        return db.session.query(MedicalFacility).options(joinedload(MedicalFacility.region)).filter(
+            db.or_(*conditions)
+        ).all()
+
+    # Most rows a database-sorted search loads without a page (/search.json)
+    MAX_SEARCH_RESULTS = 200
+
+    # Facilities shown per results page (multiple of the 3-column grid)
+    RESULTS_PER_PAGE = 24
+
+    # Sort orders the database can apply itself. The quality sorts only qualify
+    # when no specialty is selected: with a specialty the score comes from
+    # get_specialty_score(), which is computed in Python
+    SQL_SORT_ORDERS = {
+        'quality_desc': db.func.coalesce(MedicalFacility.quality_score, 0).desc(),
+        'quality_asc': db.func.coalesce(MedicalFacility.quality_score, 0).asc(),
+        'name_asc': db.func.lower(MedicalFacility.name).asc(),
+        'name_desc': db.func.lower(MedicalFacility.name).desc(),
+        'city_asc': db.func.lower(db.func.coalesce(MedicalFacility.city, '')).asc(),
+        'city_desc': db.func.lower(db.func.coalesce(MedicalFacility.city, '')).desc(),
+    }
+
+    def sql_sort_order(sort_by, specialty):
+        """Return the ORDER BY clause for sort_by, or None when the sort has to be done in Python"""
+        if specialty and sort_by.startswith('quality'):
+            return None
+        return SQL_SORT_ORDERS.get(sort_by)
+
+    # Helper function to sort the search results in Python
+    def sort_facilities(facilities, sort_by, specialty, default='quality_desc', limit=None):
+        """
+        Sort the facilities in place for the sort options computed in Python.
+        
+        The key function runs once per facility, so the lowercased names and
+        the specialty scores are not recomputed for every comparison.
+        
+        Args:
+            facilities: The list of MedicalFacility objects
+            sort_by: The sort option
+            specialty: The selected specialty, used by the quality sorts
+            default: The sort option used when sort_by is unknown
+            limit: Keep only the first `limit` facilities, selected with a heap
+                instead of sorting the whole list (None keeps them all)
+        """
+        sort_keys = {
+            'quality_desc': lambda x: get_specialty_score(x, specialty) * -1,  # Higher scores first
+            'quality_asc': lambda x: get_specialty_score(x, specialty),        # Lower scores first
+            'name_asc': lambda x: x.name.lower(),
+            'name_desc': lambda x: x.name.lower(),
+            'city_asc': lambda x: (x.city or '').lower(),
+            'city_desc': lambda x: (x.city or '').lower(),
+            'distance': lambda x: x.distance if hasattr(x, 'distance') else 9999
+        }
+        reverse_sort = sort_by.endswith('_desc') and sort_by != 'quality_desc'
+        sort_key = sort_keys.get(sort_by, sort_keys[default])
+        if limit is not None and limit < len(facilities):
+            select = heapq.nlargest if reverse_sort else heapq.nsmallest
+            facilities[:] = select(limit, facilities, key=sort_key)
+        else:
+            facilities.sort(key=sort_key, reverse=reverse_sort)
+
+    # Helper function to filter facilities by specialty names
+    def has_specialty_in(specialty_names):
+        """
+        Build a condition matching the facilities offering any of the given specialties.
+        
+        On PostgreSQL the denormalized specialty_names array is matched with an
+        indexed && overlap; elsewhere the specialties are matched in an
+        IN (SELECT facility_id ...) subquery, so the facility rows are not
+        multiplied by a join with their specialties.
+        
+        Args:
+            specialty_names: The specialty names to look for
+        
+        Returns:
+            The SQLAlchemy filter condition
+        """
+        if IS_POSTGRESQL:
+            return MedicalFacility.specialty_names.overlap(list(specialty_names))
+        
+        return has_specialty_matching(Specialty.name.in_(specialty_names))
+
+    def has_specialty_matching(condition):
+        """
+        Build a condition matching the facilities offering a specialty that satisfies condition.
+        
+        The specialties are looked up in an IN (SELECT facility_id ...) subquery
+        instead of being joined, so that every facility is returned, counted
+        and paged once however many of its specialties match.
+        
+        Args:
+            condition: A SQLAlchemy condition on Specialty
+        
+        Returns:
+            The SQLAlchemy filter condition
+        """
+        return MedicalFacility.id.in_(
+            db.select(FacilitySpecialty.facility_id)
+            .join(FacilitySpecialty.specialty)
+            .where(condition)
+        )
+
+    # Helper function to build the keyword condition on the facility name
+    def name_keywords_filter(keywords, match_all=True):
+        """
+        Build the search condition for keywords on the facility name.
+        
+        Each keyword is a substring ILIKE, which PostgreSQL answers from the
+        trigram index on the name (ix_facility_name_trgm), so "clinica" still
+        finds "Policlinico".
+        
+        Args:
+            keywords: The lowercase search keywords
+            match_all: True to require every keyword (AND), False for any of them (OR)
+        
+        Returns:
+            The SQLAlchemy filter condition
+        """
+        conditions = [MedicalFacility.name.ilike(f"%{keyword}%") for keyword in keywords]
+        return db.and_(*conditions) if match_all else db.or_(*conditions)
+
+    # Helper function to find a region or city named in the query text
+    @lru_cache(maxsize=4096)
+    def detect_query_location(query_text):
+        """
+        Detect a region or city name in the search text.
+        
+        The result only depends on the text, so it is cached: repeated
+        searches (paging, refreshes) skip the scan of the city names.
+        
+        Args:
+            query_text: The search text
+        
+        Returns:
+            tuple: (detected region name or None, query text without the location)
+        """
+        # Define Italian regions
+        italian_regions = [
+            'lombardia', 'lazio', 'toscana', 'puglia', 'veneto', 'piemonte', 'emilia romagna',
+            'campania', 'sicilia', 'trentino', 'liguria', 'friuli venezia giulia',
+            'sardegna', 'umbria', 'marche', 'calabria', 'abruzzo', 'basilicata', 'molise', 'valle d\'aosta'
+        ]
+        
+        # Initialize detected region
+        detected_region = None
+        cleaned_query = query_text
+        
+        # Check for region names in the query
+        query_lower = query_text.lower()
+        for region_name in italian_regions:
+            if region_name in query_lower:
+                detected_region = region_name.title()
+                # Remove the region name from the query
+                cleaned_query = re.sub(r'\b' + region_name + r'\b', '', query_lower, flags=re.IGNORECASE).strip()
+                break
+        
+        # If region not found directly, try to extract from city names
+        if not detected_region:
+            for city, region_name in CITY_TO_REGION_MAP.items():
+                if city in query_lower:
+                    detected_region = region_name
+                    # Remove the city name from the query
+                    cleaned_query = re.sub(r'\b' + city + r'\b', '', query_lower, flags=re.IGNORECASE).strip()
+                    break
+        
+        return detected_region, cleaned_query
+
+    def _run_search(args, page=None):
+        """
+        Esegue la ricerca delle strutture a partire dai parametri della richiesta.
+        
+        Args:
+            args: I parametri della query string (request.args)
+            page: La pagina di risultati richiesta (RESULTS_PER_PAGE strutture),
+                oppure None per tutti i risultati
+        
+        Returns:
+            tuple: (strutture ordinate della pagina, dizionario search_params per il template,
+                numero totale di strutture trovate)
+        """
+        # Get search parameters
+        params = SearchParams.from_args(args)
+        specialty = params.specialty
+        region = params.region
+        min_quality = params.min_quality
+        query_text = params.query_text
+        sort_by = params.sort_by
+        latitude = params.latitude
+        longitude = params.longitude
+        is_address_search = params.is_address_search
+        search_radius = params.search_radius
+        logger.debug("Using search radius: %s km", search_radius)
 
         # Process the search query to extract location information
         detected_location = None
@@ -184,19 +804,18 @@ with app.app_context():
         # If we have coordinates, ensure is_address_search is True
         if latitude and longitude:
             is_address_search = True
-            logger.debug(f"Using provided coordinates: lat={latitude}, lon={longitude}")
-            logger.debug(f"Setting is_address_search to True based on coordinates")
+            logger.debug("Using provided coordinates: lat=%s, lon=%s", latitude, longitude)
+            logger.debug("Setting is_address_search to True based on coordinates")
         address_search_results = None
+        # Address text Nominatim could not geocode in this request, not retried by the region fallback
+        ungeocodable_address = None
 
         # Check if we have coordinates from the location autocomplete
         if latitude and longitude:
             # Use the provided coordinates directly
-            logger.debug(f"Using provided coordinates: lat={latitude}, lon={longitude}")
+            logger.debug("Using provided coordinates: lat=%s, lon=%s", latitude, longitude)
             is_address_search = True
             
-            # Get all facilities to find ones near these coordinates
-            all_facilities = db.session.query(MedicalFacility).all()
-            
             # Create a special search location with the provided coordinates
             search_location = {
                 'lat': float(latitude),
@@ -204,22 +823,8 @@ with app.app_context():
                 'display_name': query_text
             }
             
-            # Find facilities near these coordinates
-            facilities_with_distance = []
-            for facility in all_facilities:
-                if facility.latitude and facility.longitude:
-                    distance = calculate_distance(
-                        float(latitude), float(longitude), 
-                        facility.latitude, facility.longitude
-                    )
-                    if distance <= search_radius:  # Use custom radius from user
-                        # Add distance directly to the facility object
-                        facility.distance = round(distance, 1)
-                        facility.distance_text = f"{facility.distance:.1f} km"
-                        facilities_with_distance.append(facility)
-            
-            # Sort by distance
-            facilities_with_distance.sort(key=lambda x: x.distance)
+            # Find facilities near these coordinates (use custom radius from user)
+            facilities_with_distance = facilities_within_radius(float(latitude), float(longitude), search_radius)
             
             # Create address search results structure
             address_search_results = {
@@ -230,16 +835,13 @@ with app.app_context():
         elif query_text:
             # Prioritize address/location search mode for new search interface
             # Now we treat any query from the main search field as a potential address or city name
-            logger.debug(f"Treating query as potential address/location: '{query_text}'")
+            logger.debug("Treating query as potential address/location: '%s'", query_text)
             is_address_search = True
             
             # Check if we have coordinates from frontend
             if latitude and longitude:
                 # If we have coordinates from frontend, use them directly
-                logger.debug(f"Using provided coordinates: lat={latitude}, lon={longitude}")
-                
-                # Get all facilities to find ones near these coordinates
-                all_facilities = db.session.query(MedicalFacility).all()
+                logger.debug("Using provided coordinates: lat=%s, lon=%s", latitude, longitude)
                 
                 # Create a search location from the provided coordinates
                 search_location = {
@@ -248,22 +850,8 @@ with app.app_context():
                     'display_name': query_text
                 }
                 
-                # Find facilities near these coordinates
-                facilities_with_distance = []
-                for facility in all_facilities:
-                    if facility.latitude and facility.longitude:
-                        distance = calculate_distance(
-                            float(latitude), float(longitude), 
-                            facility.latitude, facility.longitude
-                        )
-                        if distance <= search_radius:  # Use custom radius from user
-                            # Add distance directly to the facility object
-                            facility.distance = round(distance, 1)
-                            facility.distance_text = f"{facility.distance:.1f} km"
-                            facilities_with_distance.append(facility)
-                
-                # Sort by distance
-                facilities_with_distance.sort(key=lambda x: x.distance)
+                # Find facilities near these coordinates (use custom radius from user)
+                facilities_with_distance = facilities_within_radius(float(latitude), float(longitude), search_radius)
                 
                 # Create address search results structure
                 address_search_results = {
@@ -274,68 +862,45 @@ with app.app_context():
             else:
                 # Extract the address part from the query if it contains other terms
                 address_part = extract_address_part(query_text)
-                logger.debug(f"Extracted address part: '{address_part}'")
-                
-                # Get all facilities to find ones near this address
-                all_facilities = db.session.query(MedicalFacility).all()
+                logger.debug("Extracted address part: '%s'", address_part)
                 
-                # Find facilities near the specified address
+                # Find facilities near the specified address: only the candidates
+                # around the geocoded point are loaded from the database
                 # Use the custom search radius provided by the user
-                address_search_results = find_facilities_near_address(address_part, all_facilities, max_distance=search_radius)
+                address_search_results = find_facilities_near_address(address_part, address_candidates, max_distance=search_radius)
+                if not (address_search_results and address_search_results.get('search_location')):
+                    ungeocodable_address = address_part
+                
+                # Load the specialties of the matched facilities in one batch instead of one query per result
+                if address_search_results and address_search_results.get('facilities'):
+                    db.session.query(MedicalFacility).options(*FACILITY_RESULT_OPTIONS).filter(
+                        MedicalFacility.id.in_([f.id for f in address_search_results['facilities']])
+                    ).all()
             
             if address_search_results and address_search_results.get('facilities'):
-                logger.debug(f"Found {len(address_search_results['facilities'])} facilities near address: '{query_text}'")
+                logger.debug("Found %s facilities near address: '%s'", len(address_search_results['facilities']), query_text)
                 # Get the detected location display name
                 search_location = address_search_results.get('search_location', {})
                 detected_location = search_location.get('display_name', query_text)
             else:
-                logger.debug(f"No facilities found near address: '{query_text}'")
+                logger.debug("No facilities found near address: '%s'", query_text)
                 
                 # Preserve the search_location even if no facilities found, so we can still use coordinates
                 if address_search_results and address_search_results.get('search_location'):
                     search_location = address_search_results.get('search_location', {})
                     detected_location = search_location.get('display_name', query_text)
-                    logger.debug(f"Preserved location info for: {detected_location}")
+                    logger.debug("Preserved location info for: %s", detected_location)
                 else:
                     # If no facilities found near address, fall back to regular search
                     is_address_search = False
             
             # If not an address search or address search found no results, try regular search
             if not is_address_search:
-                # Try to extract region from known Italian region names in the query
-                from location_mapping import CITY_TO_REGION_MAP
-                
-                # Define Italian regions
-                italian_regions = [
-                    'lombardia', 'lazio', 'toscana', 'puglia', 'veneto', 'piemonte', 'emilia romagna',
-                    'campania', 'sicilia', 'trentino', 'liguria', 'friuli venezia giulia',
-                    'sardegna', 'umbria', 'marche', 'calabria', 'abruzzo', 'basilicata', 'molise', 'valle d\'aosta'
-                ]
-                
-                # Initialize detected region
-                detected_region = None
-                cleaned_query = query_text
-                
-                # Check for region names in the query
-                query_lower = query_text.lower()
-                for region_name in italian_regions:
-                    if region_name in query_lower:
-                        detected_region = region_name.title()
-                        # Remove the region name from the query
-                        cleaned_query = re.sub(r'\b' + region_name + r'\b', '', query_lower, flags=re.IGNORECASE).strip()
-                        break
-                
-                # If region not found directly, try to extract from city names
-                if not detected_region:
-                    for city, region_name in CITY_TO_REGION_MAP.items():
-                        if city in query_lower:
-                            detected_region = region_name
-                            # Remove the city name from the query
-                            cleaned_query = re.sub(r'\b' + city + r'\b', '', query_lower, flags=re.IGNORECASE).strip()
-                            break
+                # Try to extract region or city names from the query
+                detected_region, cleaned_query = detect_query_location(query_text)
 
                 if detected_region:
-                    logger.debug(f"Detected location in query: '{query_text}' -> region: '{detected_region}'")
+                    logger.debug("Detected location in query: '%s' -> region: '%s'", query_text, detected_region)
                     detected_location = detected_region
 
                     # Only update the query text if we found location
@@ -345,73 +910,118 @@ with app.app_context():
                         else:
                             # If the query was fully consumed by the location detection,
                             # set query_text to empty to avoid duplicate filtering
-                            logger.debug(f"Query was fully consumed by location detection: '{original_query}' -> '{detected_region}'")
+                            logger.debug("Query was fully consumed by location detection: '%s' -> '%s'", original_query, detected_region)
                             query_text = ""
 
                     # If no region was specified in the form, use the detected one
                     if not region:
                         region = detected_region
 
-        logger.debug(f"Search params: specialty={specialty}, region={region}, min_quality={min_quality}, query_text={query_text}")
+        logger.debug("Search params: specialty=%s, region=%s, min_quality=%s, query_text=%s", specialty, region, min_quality, query_text)
 
-        # Get database status
-        db_status = get_database_status()
+        # Filters on the facility table itself go first, so that fewer rows
+        # reach the specialty subqueries
+        facility_filters = []
+        if min_quality is not None and min_quality > 0:
+            facility_filters.append(MedicalFacility.quality_score >= min_quality)
+        if region:
+            facility_filters.append(in_region(region))
 
         # Build the query
-        query = db.session.query(MedicalFacility)
+        query = db.session.query(MedicalFacility).options(*FACILITY_RESULT_OPTIONS).filter(*facility_filters)
+
 
         # Apply specialty filter if provided by form
         if specialty:
             # Get equivalent specialties from our mapping system
-            from specialty_mapping import get_equivalent_specialties
             equivalent_specialties = get_equivalent_specialties(specialty)
             
             # If we have equivalent specialties, use them
             if equivalent_specialties:
-                query = query.join(MedicalFacility.specialties).join(FacilitySpecialty.specialty).filter(
-                    Specialty.name.in_(equivalent_specialties)
-                )
-                logger.debug(f"Using specialty mapping for '{specialty}': {equivalent_specialties}")
+                query = query.filter(has_specialty_in(equivalent_specialties))
+                logger.debug("Using specialty mapping for '%s': %s", specialty, equivalent_specialties)
             # Otherwise fall back to the original method
             else:
                 normalized_specialty = normalize_specialty(specialty)
-                query = query.join(MedicalFacility.specialties).join(FacilitySpecialty.specialty).filter(
-                    Specialty.name.ilike(f'%{normalized_specialty}%')
-                )
-                logger.debug(f"No specialty mapping for '{specialty}', using normalized: {normalized_specialty}")
-                
-            # Check if we'll get any results with this query
-            preliminary_count = query.count()
-            if preliminary_count == 0:
-                logger.debug(f"No results found for specialty '{specialty}', using fallback to common specialties")
-                # Reset query and join with specialties
-                query = db.session.query(MedicalFacility)
-                query = query.join(MedicalFacility.specialties).join(FacilitySpecialty.specialty)
+                specialty_condition = Specialty.name.ilike(f'%{normalized_specialty}%')
+                if db.engine.dialect.name == 'postgresql':
+                    # Also accept names similar to the input (typos, missing letters):
+                    # the pg_trgm similarity operator uses the same trigram index as ILIKE
+                    specialty_condition = db.or_(specialty_condition, Specialty.name.op('%')(normalized_specialty))
+                query = query.filter(has_specialty_matching(specialty_condition))
+                logger.debug("No specialty mapping for '%s', using normalized: %s", specialty, normalized_specialty)
                 
-                # If region is specified, keep that filter
-                if region:
-                    query = query.join(MedicalFacility.region, isouter=True).filter(Region.name.ilike(f'%{region}%'))
+            # Check if we'll get any results with this query: EXISTS stops at the
+            # first match instead of counting them all
+            if not db.session.query(query.exists()).scalar():
+                logger.debug("No results found for specialty '%s', using fallback to common specialties", specialty)
+                # Reset query (keeping the facility filters)
+                query = db.session.query(MedicalFacility).options(*FACILITY_RESULT_OPTIONS).filter(*facility_filters)
                 
                 # Filter by the most common specialties to ensure we get results
                 fallback_specialties = ['Medicina Generale', 'Medicina Interna', 'Chirurgia Generale']
-                query = query.filter(Specialty.name.in_(fallback_specialties))
-                logger.debug(f"Using fallback specialties: {fallback_specialties}")
+                query = query.filter(has_specialty_in(fallback_specialties))
+                logger.debug("Using fallback specialties: %s", fallback_specialties)
             
             specialty_filter_applied = True
         else:
             specialty_filter_applied = False
 
-        # Apply region filter if provided
-        if region:
-            query = query.join(MedicalFacility.region, isouter=True).filter(Region.name.ilike(f'%{region}%'))
+        # Let the database sort the results when it can
+        sql_order = sql_sort_order(sort_by, specialty)
+        if sql_order is not None:
+            query = query.order_by(sql_order)
 
-        # Apply quality filter if provided
-        if min_quality is not None and min_quality > 0:
-            query = query.filter(MedicalFacility.quality_score >= min_quality)
+        def page_bounds(total):
+            """(start, stop) of the requested page among total sorted results, clamped to the last page"""
+            if page is None:
+                return 0, total
+            last_page = max(1, -(-total // RESULTS_PER_PAGE))
+            start = (min(page, last_page) - 1) * RESULTS_PER_PAGE
+            return start, start + RESULTS_PER_PAGE
+
+        # Whether the last fetch_results() call only loaded the requested page
+        results_paged = False
+
+        def fetch_results(q):
+            """
+            Run a search query, returning (rows, total number of matches).
+            
+            When the database sorts the results it also pages them: only the
+            requested page is loaded (LIMIT/OFFSET, next to a COUNT of the
+            matches), or the first MAX_SEARCH_RESULTS rows without a page.
+            Results sorted (or re-sorted by distance) in Python need all the rows.
+            
+            The search queries match the specialties in subqueries, never in a
+            join, so every row is a different facility: LIMIT and COUNT apply
+            to facilities, not to facility/specialty pairs.
+            """
+            nonlocal results_paged
+            results_paged = False
+            if sql_order is None or is_address_search:
+                rows = q.all()
+                return rows, len(rows)
+            # The id breaks ties in the sort order, so that the limit and the
+            # pages cut the results at the same place on every request
+            q = q.order_by(MedicalFacility.id)
+            if page is None:
+                rows = q.limit(MAX_SEARCH_RESULTS).all()
+                # Count the matches only when the limit cut some of them off
+                if len(rows) < MAX_SEARCH_RESULTS:
+                    return rows, len(rows)
+                return rows, q.order_by(None).count()
+            total = q.order_by(None).count()
+            start, stop = page_bounds(total)
+            rows = q.offset(start).limit(stop - start).all()
+            results_paged = True
+            return rows, total
 
         # Apply text search if provided
         mapped_specialties = []
         if query_text:
+            # Lowercase the query once; the name filters compare it case-insensitively
+            query_text_lower = query_text.lower()
+            
             # First, try to map the query to medical profession terms
             profession_specialties = map_profession_to_specialties(query_text)
 
@@ -422,106 +1032,85 @@ with app.app_context():
             else:
                 mapped_specialties = profession_specialties
 
-            logger.debug(f"Mapped query '{query_text}' to specialties: {mapped_specialties}")
+            logger.debug("Mapped query '%s' to specialties: %s", query_text, mapped_specialties)
 
             # Create a copy of the query before applying specialty filters
             base_query = query
             specialty_search_applied = False
+            specialty_match_possible = True
+            known_specialties = get_specialty_names()
 
             # If not already filtered by specialty form field and we have mapped specialties
             if not specialty_filter_applied and mapped_specialties:
                 specialty_search_applied = True
                 
                 # For each specialty from mapping, expand it to include equivalent specialties
-                from specialty_mapping import get_equivalent_specialties
-                expanded_specialties = []
-                for s in mapped_specialties:
-                    equiv_specs = get_equivalent_specialties(s)
-                    if equiv_specs:
-                        expanded_specialties.extend(equiv_specs)
-                    else:
-                        expanded_specialties.append(s)
+                expanded_specialties = expand_specialties(tuple(mapped_specialties))
                         
-                logger.debug(f"Expanded mapped specialties: {mapped_specialties} -> {expanded_specialties}")
+                logger.debug("Expanded mapped specialties: %s -> %s", mapped_specialties, expanded_specialties)
                 
-                query = query.join(MedicalFacility.specialties).join(FacilitySpecialty.specialty).filter(
-                    Specialty.name.in_(expanded_specialties)
-                )
+                # Names missing from the database cannot match: drop them, and skip
+                # the query altogether when none is left
+                expanded_specialties = [s for s in expanded_specialties if s in known_specialties]
+                if expanded_specialties:
+                    query = query.filter(has_specialty_in(expanded_specialties))
+                else:
+                    specialty_match_possible = False
 
             # Special case for "ospedale [region]" patterns or when query is empty but region is set
             # and original query had "ospedale"
-            if ('ospedale' in query_text.lower() and region) or (query_text == "" and region and 'ospedale' in original_query.lower()):
+            if ('ospedale' in query_text_lower and region) or (query_text == "" and region and 'ospedale' in original_query.lower()):
                 # This will find all hospitals in the specified region
                 search_term = "%ospedale%"
-                query = query.filter(db.func.lower(MedicalFacility.name).like(search_term))
+                query = query.filter(MedicalFacility.name.ilike(search_term))
                 specialty_search_applied = True
                 # For logging and user interface clarity
                 if query_text == "":
-                    logger.debug(f"Empty query_text with 'ospedale' in original query '{original_query}', showing all hospitals in '{region}'")
+                    logger.debug("Empty query_text with 'ospedale' in original query '%s', showing all hospitals in '%s'", original_query, region)
                     mapped_specialties = ["Tutti gli ospedali della regione"]
             # Special case for "[profession] [city]" patterns (e.g., "oncologo trieste")
-            elif any(p in query_text.lower() for p in PROFESSION_TO_SPECIALTY_MAP.keys()) and region:
-                # Get the profession term
-                prof_term = None
-                for term in PROFESSION_TO_SPECIALTY_MAP.keys():
-                    if term in query_text.lower():
-                        prof_term = term
-                        break
+            # The profession terms are only scanned for (in a single regex pass over
+            # the text) when a region is set and the hospital case did not apply
+            elif region and (prof_term := find_profession_term(query_text_lower)):
+                # Find specialties associated with this profession
+                specialties_to_search = PROFESSION_TO_SPECIALTY_MAP[prof_term]
+                logger.debug("Found profession term '%s' mapping to: %s", prof_term, specialties_to_search)
                 
-                if prof_term:
-                    # Find specialties associated with this profession
-                    specialties_to_search = PROFESSION_TO_SPECIALTY_MAP[prof_term]
-                    logger.debug(f"Found profession term '{prof_term}' mapping to: {specialties_to_search}")
-                    
-                    # Expand the specialties using our macrocategory mapping
-                    from specialty_mapping import get_equivalent_specialties
-                    expanded_specialties = []
-                    for s in specialties_to_search:
-                        equiv_specs = get_equivalent_specialties(s)
-                        if equiv_specs:
-                            expanded_specialties.extend(equiv_specs)
-                        else:
-                            expanded_specialties.append(s)
-                    
-                    logger.debug(f"Expanded profession specialties: {specialties_to_search} -> {expanded_specialties}")
-                    
-                    # Join with specialties tables
-                    query = query.join(MedicalFacility.specialties).join(FacilitySpecialty.specialty)
-                    
-                    # Filter by these specialties
-                    query = query.filter(Specialty.name.in_(expanded_specialties))
-                    specialty_search_applied = True
+                # Specialties expanded with our macrocategory mapping (precomputed)
+                expanded_specialties = PROFESSION_TO_EXPANDED_SPECIALTIES[prof_term]
+                
+                logger.debug("Expanded profession specialties: %s -> %s", specialties_to_search, expanded_specialties)
+                
+                # Filter by these specialties (only the ones in the database can match)
+                expanded_specialties = [s for s in expanded_specialties if s in known_specialties]
+                if expanded_specialties:
+                    query = query.filter(has_specialty_in(expanded_specialties))
+                else:
+                    specialty_match_possible = False
+                specialty_search_applied = True
             # If no medical mapping found or specialty already filtered, do regular text search
             elif not specialty_search_applied or specialty_filter_applied:
-                # Join with specialties only if not already joined
-                if not specialty_filter_applied:
-                    query = query.outerjoin(MedicalFacility.specialties).outerjoin(FacilitySpecialty.specialty)
+                # The keywords are only matched against the facility names, so the
+                # specialties are not needed here. Each keyword is a substring ILIKE
+                # answered by the trigram index on PostgreSQL: a full-text index would
+                # only match word prefixes ("clinica" would miss "Policlinico")
                 
                 # Dividi il testo della query in parole chiave per una ricerca più flessibile
-                keywords = query_text.lower().split()
-                logger.debug(f"Parole chiave per la ricerca: {keywords}")
-                
-                # Crea filtri per ogni parola chiave
-                filters = []
-                for keyword in keywords:
-                    # Usa % per ricerca parziale
-                    search_term = f"%{keyword}%"
-                    
-                    # Cerca solo nei nomi delle strutture (modificato come richiesto)
-                    keyword_filter = db.func.lower(MedicalFacility.name).like(search_term)
-                    filters.append(keyword_filter)
+                keywords = query_text_lower.split()
+                logger.debug("Parole chiave per la ricerca: %s", keywords)
                 
-                # Applica tutti i filtri con AND tra le parole chiave
-                if filters:
-                    query = query.filter(db.and_(*filters))
-                    logger.debug(f"Applicati {len(filters)} filtri di ricerca per parole chiave")
+                # Applica le parole chiave con AND tra loro
+                # Cerca solo nei nomi delle strutture (modificato come richiesto)
+                if keywords:
+                    query = query.filter(name_keywords_filter(keywords))
+                    logger.debug("Applicati %s filtri di ricerca per parole chiave", len(keywords))
 
             # Execute query to see if we found any results
-            facilities = query.all()
+            facilities, total_results = fetch_results(query) if specialty_match_possible else ([], 0)
 
             # If no facilities found and we've tried specialty mapping, fall back to general search
-            if len(facilities) == 0 and specialty_search_applied:
-                logger.debug(f"No facilities found with specialty mapping, falling back to broader search")
+            if total_results == 0 and specialty_search_applied:
+                logger.debug("No facilities found with specialty mapping, falling back to broader search")
 
                 # We need a fresh query with original filters (region, quality) but not the specialty mapping
                 query = base_query
@@ -529,20 +1118,16 @@ with app.app_context():
                 # Get general medical specialties to try as fallbacks
                 general_specialties = ['Medicina Generale', 'Medicina Interna', 'Ortopedia']
 
-                # Join specialties tables
-                query = query.join(MedicalFacility.specialties).join(FacilitySpecialty.specialty)
-
                 # Dividi anche qui il testo della query in parole chiave per la ricerca fallback
-                keywords = query_text.lower().split()
-                logger.debug(f"Parole chiave per la ricerca fallback: {keywords}")
+                keywords = query_text_lower.split()
+                logger.debug("Parole chiave per la ricerca fallback: %s", keywords)
                 
                 # Prepara le condizioni di base includendo sempre le specialità generali
-                base_conditions = [Specialty.name.in_(general_specialties)]
+                base_conditions = [has_specialty_in(general_specialties)]
                 
-                # Aggiungi condizioni per ogni parola chiave nella ricerca per nome (solo nomi delle strutture)
-                for keyword in keywords:
-                    search_term = f"%{keyword}%"
-                    base_conditions.append(db.func.lower(MedicalFacility.name).like(search_term))
+                # Aggiungi le parole chiave nella ricerca per nome (solo nomi delle strutture)
+                if keywords:
+                    base_conditions.append(name_keywords_filter(keywords, match_all=False))
                 
                 # Applica le condizioni con OR tra tutte
                 query = query.filter(db.or_(*base_conditions))
@@ -556,15 +1141,15 @@ with app.app_context():
                     mapped_specialties.extend(general_specialties)
 
                 # Re-execute query to get facilities
-                facilities = query.all()
-                logger.debug(f"Fallback search found {len(facilities)} facilities")
+                facilities, total_results = fetch_results(query)
+                logger.debug("Fallback search found %s facilities", total_results)
             else:
                 # We already have facilities from the first query
-                logger.debug(f"Primary search found {len(facilities)} facilities")
+                logger.debug("Primary search found %s facilities", total_results)
         else:
             # No text search, just execute the query with existing filters
-            facilities = query.all()
-            logger.debug(f"Basic filter search found {len(facilities)} facilities")
+            facilities, total_results = fetch_results(query)
+            logger.debug("Basic filter search found %s facilities", total_results)
 
         # Check if we're using address search results
         if is_address_search and address_search_results:
@@ -577,7 +1162,7 @@ with app.app_context():
             # Get the preserved search radius if available from address_search_results
             if address_search_results.get('max_distance'):
                 preserved_radius = address_search_results.get('max_distance')
-                logger.debug(f"Using preserved search radius from address_search_results: {preserved_radius} km")
+                logger.debug("Using preserved search radius from address_search_results: %s km", preserved_radius)
                 search_radius = preserved_radius
                 
             # If we have facilities from address search, use them directly
@@ -586,7 +1171,7 @@ with app.app_context():
                 facilities = address_search_results['facilities']
             # Otherwise, we'll use the results from our regular search and add distance to them
             elif facilities and search_location.get('lat') and search_location.get('lon'):
-                logger.debug(f"Adding distance calculations to {len(facilities)} facilities from regular search")
+                logger.debug("Adding distance calculations to %s facilities from regular search", len(facilities))
                 
                 # Add distance to the facilities from our regular search
                 for facility in facilities:
@@ -608,30 +1193,24 @@ with app.app_context():
             # Add distance information for display with the custom radius
             mapped_specialties = [f"Strutture entro {int(search_radius)} km da {search_location.get('display_name', query_text)}"]
             
+            # The address results are sorted in Python: slice the page out of them
+            total_results = len(facilities)
+            start, stop = page_bounds(total_results)
+            
             # Check if user wants to sort by something other than distance
             if sort_by != 'distance':
-                logger.debug(f"Resorting address search results by {sort_by} instead of distance")
-                
-                # Use a more sophisticated sorting that prioritizes the selected specialty if available
-                sorting_functions = {
-                    'quality_desc': lambda x: get_specialty_score(x, specialty) * -1,  # Higher scores first
-                    'quality_asc': lambda x: get_specialty_score(x, specialty),        # Lower scores first
-                    'name_asc': lambda x: x.name.lower(),
-                    'name_desc': lambda x: x.name.lower(),
-                    'city_asc': lambda x: (x.city or '').lower(),
-                    'city_desc': lambda x: (x.city or '').lower(),
-                    'distance': lambda x: x.distance if hasattr(x, 'distance') else 9999  # Keep original distance sort
-                }
+                logger.debug("Resorting address search results by %s instead of distance", sort_by)
                 
-                reverse_sort = sort_by.endswith('_desc') and sort_by != 'quality_desc'
-                sort_function = sorting_functions.get(sort_by, sorting_functions['distance'])
-                facilities = sorted(facilities, key=sort_function, reverse=reverse_sort)
-                logger.debug(f"Re-sorted facilities by {sort_by}")
+                # Use a more sophisticated sorting that prioritizes the selected specialty if available;
+                # only the facilities up to the end of the requested page need to be in order
+                sort_facilities(facilities, sort_by, specialty, default='distance',
+                                limit=stop if page is not None else MAX_SEARCH_RESULTS)
+                logger.debug("Re-sorted facilities by %s", sort_by)
             else:
-                logger.debug(f"Using address search results with original distance sorting")
+                logger.debug("Using address search results with original distance sorting")
             
             # Add is_address_search flag to indicate this is an address search
-            return render_template('results_stars_only.html', facilities=facilities, db_status=db_status, search_params={
+            return facilities[start:stop], {
                 'specialty': specialty,
                 'region': region,
                 'min_quality': min_quality,
@@ -643,45 +1222,47 @@ with app.app_context():
                 'is_address_search': True,
                 'search_location': search_location,
                 'search_radius': int(search_radius)  # Pass the actual search radius used
-            })
+            }, total_results
         else:
             # Special case for address searches that found no nearby facilities
             # but did successfully recognize a location
-            if len(facilities) == 0 and is_address_query(query_text) and not is_address_search:
+            # (cheap checks first: the address pattern match only runs when nothing was found)
+            if not total_results and not is_address_search and is_address_query(query_text):
                 # Try to extract region from geocoded data if possible
                 detected_region = None
                 
                 # Geocode the address to get coordinates and region information
-                from geocoding import extract_address_part, parse_address, geocode_address, calculate_distance
-                
                 address_part = extract_address_part(query_text)
                 address_components = parse_address(address_part)
                 geocoded_data = None
                 
-                if address_components:
+                # Skip the (rate-limited) Nominatim call when this address just failed to geocode
+                if address_components and address_part != ungeocodable_address:
                     geocoded_data = geocode_address(address_components)
                 
                 # If geocoding successful, extract region from the result
                 if geocoded_data and 'region' in geocoded_data:
                     detected_region = geocoded_data['region']
-                    logger.debug(f"Extracted region from address: {detected_region}")
+                    logger.debug("Extracted region from address: %s", detected_region)
                 
                 # Use detected region if available, otherwise fall back to region parameter
                 region_to_use = detected_region or region
                 
-                logger.debug(f"Address search failed to find nearby facilities, showing all in detected region: {region_to_use}")
+                logger.debug("Address search failed to find nearby facilities, showing all in detected region: %s", region_to_use)
                 
                 # If we've detected a region from the address query and have no results,
                 # show all facilities in that region without other filters
                 if region_to_use:
                     # Clear query and create a fresh one with just the region filter
-                    query = db.session.query(MedicalFacility)
-                    query = query.join(MedicalFacility.region).filter(Region.name.ilike(f'%{region_to_use}%'))
-                    facilities = query.all()
+                    query = db.session.query(MedicalFacility).options(*FACILITY_RESULT_OPTIONS)
+                    query = query.filter(in_region(region_to_use))
+                    if sql_order is not None:
+                        query = query.order_by(sql_order)
+                    facilities, total_results = fetch_results(query)
                     
                     # Add message about showing all facilities in region
                     mapped_specialties = [f"Tutte le strutture nella regione {region_to_use}"]
-                    logger.debug(f"Showing all {len(facilities)} facilities in region {region_to_use}")
+                    logger.debug("Showing all %s facilities in region %s", total_results, region_to_use)
                     
                     # Update region parameter with detected region
                     region = region_to_use
@@ -704,7 +1285,7 @@ with app.app_context():
                         
                         # Pre-sort by distance before applying potential other sorts
                         facilities.sort(key=lambda x: x.distance if hasattr(x, 'distance') else 9999)
-                        logger.debug(f"Pre-sorted facilities by distance for region search")
+                        logger.debug("Pre-sorted facilities by distance for region search")
             
             # Regular search results - sort the facilities based on the sort_by parameter
             
@@ -712,7 +1293,7 @@ with app.app_context():
             # Questo assicura che le distanze vengano mostrate nei riquadri anche se non stiamo ordinando per distanza
             if latitude and longitude:
                 # Calculate distances for all facilities
-                logger.debug(f"Calculating distances for all facilities")
+                logger.debug("Calculating distances for all facilities")
                 for facility in facilities:
                     if facility.latitude and facility.longitude:
                         distance = calculate_distance(
@@ -734,28 +1315,21 @@ with app.app_context():
                     # Assicuriamoci che le coordinate siano passate correttamente
                     search_location = {'lat': latitude, 'lon': longitude}
             
-            sorting_functions = {
-                'quality_desc': lambda x: get_specialty_score(x, specialty) * -1,  # Higher scores first
-                'quality_asc': lambda x: get_specialty_score(x, specialty),        # Lower scores first
-                'name_asc': lambda x: x.name.lower(),
-                'name_desc': lambda x: x.name.lower(),
-                'city_asc': lambda x: (x.city or '').lower(),
-                'city_desc': lambda x: (x.city or '').lower(),
-                'distance': lambda x: x.distance if hasattr(x, 'distance') else 9999  # Add distance sorting support
-            }
-
-            reverse_sort = sort_by.endswith('_desc') and sort_by != 'quality_desc'
-
-            # If sort_by is not in our mapping, default to quality descending
-            sort_function = sorting_functions.get(sort_by, sorting_functions['quality_desc'])
-
-            # Sort the facilities
-            facilities = sorted(facilities, key=sort_function, reverse=reverse_sort)
+            # Sort the facilities (unless the query already returned them in order);
+            # unknown sort options default to quality descending
+            if sql_order is None:
+                sort_facilities(facilities, sort_by, specialty)
+                logger.debug("Sorted facilities by %s", sort_by)
+            else:
+                logger.debug("Facilities sorted by %s in the database", sort_by)
 
-            logger.debug(f"Sorted facilities by {sort_by}")
+            # Results sorted in Python are paged here; the database already paged the others
+            if not results_paged:
+                start, stop = page_bounds(total_results)
+                facilities = facilities[start:stop]
 
             # Return results template
-            return render_template('results_stars_only.html', facilities=facilities, db_status=db_status, search_params={
+            return facilities, {
                 'specialty': specialty,
                 'region': region,
                 'min_quality': min_quality,
@@ -767,7 +1341,76 @@ with app.app_context():
                 'is_address_search': is_address_search or (latitude and longitude),  # True se abbiamo coordinate o è una ricerca per indirizzo
                 'search_radius': int(search_radius) if search_radius else 30,  # Default to 30 if not an address search
                 'search_location': {'lat': latitude, 'lon': longitude} if latitude and longitude else None
+            }, total_results
+
+    @app.route('/search')
+    def search():
+        # Only one page of the sorted results is loaded and rendered
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_facilities, search_params, total_results = _run_search(request.args, page=page)
+        db_status = get_database_status()
+        
+        total_pages = max(1, -(-total_results // RESULTS_PER_PAGE))
+        page = min(page, total_pages)
+        
+        def page_url(page_number):
+            """URL of another results page, keeping the current search parameters"""
+            return url_for('search', **{**request.args.to_dict(), 'page': page_number})
+        
+        # Stream the page while it renders: the first bytes (head, search form)
+        # reach the browser before the whole result list has been rendered
+        return stream_template('results_stars_only.html', facilities=page_facilities, db_status=db_status,
+                               search_params=search_params, total_results=total_results,
+                               page=page, total_pages=total_pages, page_url=page_url)
+
+    @app.route('/search.json')
+    def search_json():
+        """Variante JSON di /search: stessi parametri, senza rendering del template"""
+        facilities, search_params, total_results = _run_search(request.args)
+        
+        data = []
+        for facility in facilities:
+            data.append({
+                'id': facility.id,
+                'name': facility.name,
+                'address': facility.address,
+                'city': facility.city,
+                'region': facility.region.name if facility.region else None,
+                'quality_score': facility.quality_score,
+                'telephone': facility.telephone,
+                'website': facility.website,
+                'latitude': facility.latitude,
+                'longitude': facility.longitude,
+                'distance': getattr(facility, 'distance', None)
             })
+        
+        return jsonify({
+            'count': len(data),
+            'total': total_results,  # Facilities matched: greater than count when only the first MAX_SEARCH_RESULTS are returned
+            'facilities': data,
+            'mapped_specialties': search_params.get('mapped_specialties'),
+            'detected_location': search_params.get('detected_location')
+        })
+
+    def count_facilities():
+        """
+        Count all the facilities, the geocoded ones and the ones with coordinates.
+        
+        All counters come from a single SELECT count(*) ... FILTER (...) statement.
+        
+        Returns:
+            tuple: (total, geocoded, with_coordinates)
+        """
+        return tuple(db.session.execute(
+            db.select(
+                db.func.count(),
+                db.func.count().filter(MedicalFacility.geocoded == True),
+                db.func.count().filter(
+                    MedicalFacility.latitude != None,
+                    MedicalFacility.longitude != None
+                )
+            ).select_from(MedicalFacility)
+        ).one())
 
     @app.route('/data-manager')
     def data_manager():
@@ -789,14 +1432,11 @@ with app.app_context():
 
         # Count facilities
         try:
-            total_facilities = db.session.query(MedicalFacility).count()
-            geocoded_facilities = db.session.query(MedicalFacility).filter(MedicalFacility.geocoded == True).count()
-            facilities_with_coords = db.session.query(MedicalFacility)\
-                .filter(MedicalFacility.latitude != None)\
-                .filter(MedicalFacility.longitude != None).count()
+            total_facilities, geocoded_facilities, facilities_with_coords = count_facilities()
             
             geocoded_percentage = round((geocoded_facilities / total_facilities) * 100) if total_facilities > 0 else 0
-        except:
+        except OperationalError as e:
+            logger.error(f"Error counting facilities: {str(e)}")
             total_facilities = 0
             geocoded_facilities = 0
             facilities_with_coords = 0
@@ -815,14 +1455,18 @@ with app.app_context():
             3: ["Friuli-Venezia Giulia", "Umbria", "Basilicata", "Molise", "Valle d Aosta"]
         }
 
+        def region_key(name):
+            # "Emilia-Romagna", "Emilia Romagna" and "Valle d'Aosta", "Valle d Aosta"
+            # are the same region: compare lowercase letters only
+            return re.sub(r'[^a-z]', '', name.lower())
+
         batch_status = {}
-        region_names = [r.name for r in regions]
+        region_keys = {region_key(r.name) for r in regions}
 
         for batch_num, expected_regions in batch_regions.items():
             # Check if at least 3 regions from this batch exist in the database
             # (allowing for some flexibility if certain regions fail to load)
-            found_regions = [r for r in expected_regions if any(er in r for er in region_names)]
-            batch_status[batch_num] = len(found_regions) >= 3
+            batch_status[batch_num] = len(region_keys & {region_key(r) for r in expected_regions}) >= 3
 
         all_batches_loaded = all(batch_status.values())
 
@@ -843,7 +1487,9 @@ with app.app_context():
             geocode_command=geocode_command,
             geocoded_facilities=geocoded_facilities,
             facilities_with_coords=facilities_with_coords,
-            geocoded_percentage=geocoded_percentage
+            geocoded_percentage=geocoded_percentage,
+            job_id=request.args.get('job'),
+            admin_key=admin_key
         )
 
     @app.route('/load-data')
@@ -855,59 +1501,58 @@ with app.app_context():
             flash("Accesso non autorizzato all'area di amministrazione.", "danger")
             return redirect(url_for('index'))
             
-        try:
-            # We now support batch loading to avoid timeouts
-            logger.info(f"Loading data batch {batch}")
+        # Load the batch in a background process: a full batch takes minutes and
+        # would otherwise hold this worker (and time out) for the whole load
+        # Only clear database on the first batch
+        if batch == 0:
+            logger.info("This is the first batch, the database will be cleared...")
+        else:
+            logger.info(f"Loading batch {batch}, continuing from previous batches")
 
-            # Import the data_loader module
-            import data_loader
+        cmd = [sys.executable, 'background_load_data.py', '--batch', str(batch)]
+        job_id = start_job('Data loading', cmd, 'data_loading.log', batch=batch)
+        logger.info(f"Started background data load for batch {batch} (job {job_id})")
 
-            # Only clear database on the first batch
-            if batch == 0:
-                logger.info("This is the first batch, clearing database...")
-            else:
-                logger.info(f"Loading batch {batch}, continuing from previous batches")
+        flash(f"Started loading batch {batch} in the background. This page will refresh when it is done.", "info")
 
-            # Load the data with batch parameter for limiting regions
-            stats = load_data(batch=batch)
+        # Redirect to the data manager page with admin key and the job to follow
+        return redirect(f'/data-manager?admin_key={admin_key}&job={job_id}')
 
-            # Provide info about continuing the loading process
-            total_batches = 4  # We'll split the 20 regions into 4 batches of 5 each
+    @app.route('/job-status/<job_id>')
+    def job_status(job_id):
+        """Status of a background job, polled by the data manager page"""
+        # PROTECTED ADMIN ROUTE
+        admin_key = request.args.get('admin_key')
+        if admin_key != os.environ.get('ADMIN_KEY', 'Cq9K7pLmN3rT5vX8zBdAeYgF'):
+            return jsonify({'error': 'unauthorized'}), 403
 
-            if batch < total_batches - 1:
-                next_batch = batch + 1
-                flash(f"Batch {batch} loaded successfully! Added {stats['total']} facilities from {stats['regions']} regions. " +
-                      f"Continue loading with batch {next_batch}.", "success")
-                # Add a link to the next batch that includes the admin key
-                next_batch_url = f"/load-data/{next_batch}?admin_key={admin_key}"
-                flash(f"<a href='{next_batch_url}' class='btn btn-primary'>Load Next Batch</a>", "info")
-            else:
-                flash(f"Final batch loaded successfully! Added {stats['total']} facilities from {stats['regions']} regions. " +
-                      f"All regions are now loaded.", "success")
-        except Exception as e:
-            logger.error(f"Error loading data batch {batch}: {str(e)}")
-            logger.exception(e)  # Log the full exception for debugging
-            db.session.rollback()
-            flash(f"Error loading data batch {batch}: {str(e)}", "danger")
+        _reap_processes()
 
-        # Redirect to the data manager page with admin key
-        return redirect(f'/data-manager?admin_key={admin_key}')
+        job = db.session.get(BackgroundJob, job_id)
+        if job is None:
+            return jsonify({'job_id': job_id, 'status': 'unknown'}), 404
 
-    @app.context_processor
-    def utility_processor():
-        """Add utility functions to template context"""
-        def format_quality(quality):
-            if quality is None:
-                return "N/A"
-            return f"{quality:.1f}/5.0"
-
-        return dict(format_quality=format_quality)
+        return jsonify({
+            'job_id': job_id,
+            'kind': job.kind,
+            'log': job.log_file,
+            'status': job.status,
+            **(job.details or {})
+        })
+
+    # Registered once as a Jinja filter ({{ rating|quality }}) instead of a
+    # context processor that rebuilds the helpers on every render
+    @app.template_filter('quality')
+    def format_quality(quality):
+        """Format a quality rating for display (e.g. 4.3/5.0)"""
+        if quality is None:
+            return "N/A"
+        return f"{quality:.1f}/5.0"
     
     @app.route('/methodology')
     def methodology():
         """Show detailed information about our rating methodology"""
         # Get data for the form dropdowns (regions and specialties)
-        from data_loader import get_regions, get_specialties
         regions = get_regions()
         specialties = get_specialties()
         
@@ -923,69 +1568,22 @@ with app.app_context():
             flash("Accesso non autorizzato all'area di amministrazione.", "danger")
             return redirect(url_for('index'))
             
-        try:
-            # For large batches, start a background process to avoid timeouts
-            if batch_size > 10:
-                import subprocess
-                import sys
-                
-                # Launch the background geocoding script for larger batches
-                cmd = [sys.executable, 'background_geocoding.py', '--batch-size', str(5)]
-                subprocess.Popen(cmd)
-                
-                flash(f"Started background geocoding process for facilities. Check the logs for progress.", "success")
-                flash(f"Small batches are processed immediately, larger ones in the background to avoid timeouts.", "info")
-                
-                logger.info(f"Started background geocoding process for {batch_size} facilities")
-                
-                # Get current stats for display
-                from geocode_facilities import get_geocoding_statistics
-                stats = get_geocoding_statistics()
-                flash(f"Current stats: {stats['geocoded']}/{stats['total']} facilities have been geocoded.", "info")
-                
-                return redirect(request.referrer or '/')
-            
-            # Import the geocoding module
-            from geocode_facilities import geocode_facilities
-            
-            # Get statistics before
-            with app.app_context():
-                facilities_before = db.session.query(MedicalFacility).filter(MedicalFacility.geocoded == True).count()
-                coords_before = db.session.query(MedicalFacility).filter(
-                    MedicalFacility.latitude != None, 
-                    MedicalFacility.longitude != None
-                ).count()
-            
-            # For smaller batches, process directly with a lower batch size
-            # and shorter delay to avoid timeouts
-            geocode_facilities(batch_size=5, max_facilities=batch_size)
-            
-            # Get statistics after
-            with app.app_context():
-                facilities_after = db.session.query(MedicalFacility).filter(MedicalFacility.geocoded == True).count()
-                coords_after = db.session.query(MedicalFacility).filter(
-                    MedicalFacility.latitude != None, 
-                    MedicalFacility.longitude != None
-                ).count()
-            
-            # Calculate how many were processed
-            facilities_processed = facilities_after - facilities_before
-            coords_added = coords_after - coords_before
-            
-            flash(f"Geocoded {facilities_processed} facilities, with {coords_added} successful coordinate lookups.", "success")
-            
-            # Remind about background processing option
-            flash(f"For full background geocoding, use: python background_geocoding.py --continuous", "info")
-            
-            logger.info(f"Geocoded {facilities_processed} facilities (web batch), added {coords_added} coordinates")
-            
-        except Exception as e:
-            logger.error(f"Error geocoding facilities: {str(e)}")
-            logger.exception(e)
-            flash(f"Error geocoding facilities: {str(e)}", "danger")
-        
-        # Redirect to the data manager page with admin key preserved
-        return redirect(f'/data-manager?admin_key={admin_key}')
+        # Geocoding waits on Nominatim (about a second per facility): run it in a
+        # background process instead of holding this worker, like /load-data
+        if batch_size > 10:
+            # Larger requests geocode all the remaining facilities in small batches
+            cmd = [sys.executable, 'background_geocoding.py', '--batch-size', str(5)]
+        else:
+            cmd = [sys.executable, 'background_geocoding.py', '--batch-size', str(batch_size), '--once']
+        job_id = start_job('Geocoding', cmd, 'geocoding.log', batch_size=batch_size)
+        logger.info(f"Started background geocoding of {batch_size} facilities (job {job_id})")
+
+        flash(f"Started geocoding in the background. This page will refresh when it is done.", "info")
+        # Remind about background processing option
+        flash(f"For continuous background geocoding, use: python background_geocoding.py --continuous", "info")
+
+        # Redirect to the data manager page with admin key and the job to follow
+        return redirect(f'/data-manager?admin_key={admin_key}&job={job_id}')
     
     @app.route('/download-db')
     def download_database():
@@ -996,56 +1594,63 @@ with app.app_context():
             flash("Accesso non autorizzato all'area di amministrazione.", "danger")
             return redirect(url_for('index'))
             
-        import tempfile
-        from flask import send_file
-        from export_database import export_database
+        # Show a message in the logs
+        logger.info("Starting database export to CSV/ZIP format...")
         
-        try:
-            # Show a message in the logs
-            logger.info("Starting database export to CSV/ZIP format...")
-            
-            # Export the database to CSV files and zip them
-            export_file = export_database()
-            
-            if export_file and os.path.exists(export_file):
-                logger.info(f"Database export successful: {export_file}")
-                # Return the file for download
-                return send_file(
-                    export_file,
-                    mimetype='application/zip',
-                    as_attachment=True,
-                    download_name=os.path.basename(export_file)
-                )
-            else:
-                logger.error("Failed to export database: No file was created")
-                return "Failed to export database. The export process did not create a file.", 500
-        except Exception as e:
-            logger.error(f"Error exporting database: {str(e)}")
-            return f"Error exporting database: {str(e)}", 500
+        def generate():
+            # Once the first chunk is sent the status can no longer change:
+            # errors can only be logged, leaving the download truncated
+            try:
+                yield from iter_database_zip(db.engine)
+                logger.info("Database export streamed successfully")
+            except Exception as e:
+                logger.error(f"Error exporting database: {str(e)}")
+                raise
+        
+        # Stream the archive while it is being written, instead of building it on disk first
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': f'attachment; filename=medical_facilities_export_{timestamp}.zip',
+                # Ask nginx-style proxies to pass the chunks on instead of buffering the whole archive
+                'X-Accel-Buffering': 'no'
+            }
+        )
     
     # SEO friendly routes
+    # Crawler files never change between deployments: let crawlers, proxies and
+    # CDNs keep them for a day (and revalidate with the ETag afterwards)
+    CRAWLER_FILES_MAX_AGE = 86400  # seconds
+
     @app.route('/robots.txt')
     def robots():
         """Serve robots.txt file"""
-        return send_file('static/robots.txt')
+        return send_file('static/robots.txt', max_age=CRAWLER_FILES_MAX_AGE)
     
     @app.route('/sitemap.xml')
     def sitemap():
         """Serve sitemap.xml file"""
-        return send_file('static/sitemap.xml')
+        return send_file('static/sitemap.xml', max_age=CRAWLER_FILES_MAX_AGE)
         
     @app.route('/urls')
     def url_list():
         """Serve a list of all important URLs for crawler discovery"""
-        return send_file('static/urls.txt')
+        return send_file('static/urls.txt', max_age=CRAWLER_FILES_MAX_AGE)
     
-    @app.route('/.well-known/security.txt')
-    def security_txt():
-        """Security.txt file with contact information for security researchers"""
-        return """Contact: mailto:sicurezza@findmycure-italia.it
+    SECURITY_TXT = """Contact: mailto:sicurezza@findmycure-italia.it
 Expires: 2026-04-09T00:00:00.000Z
 Preferred-Languages: it, en
 """
+
+    @app.route('/.well-known/security.txt')
+    def security_txt():
+        """Security.txt file with contact information for security researchers"""
+        response = Response(SECURITY_TXT, mimetype='text/plain')
+        response.cache_control.public = True
+        response.cache_control.max_age = CRAWLER_FILES_MAX_AGE
+        return response
     
     @app.route('/heatmap')
     def heatmap():
@@ -1055,11 +1660,7 @@ Preferred-Languages: it, en
         specialties = get_specialties()
         
         # Ottieni statistiche sulle strutture con coordinate
-        total_facilities = db.session.query(MedicalFacility).count()
-        geocoded_facilities = db.session.query(MedicalFacility).filter(
-            MedicalFacility.latitude != None,
-            MedicalFacility.longitude != None
-        ).count()
+        total_facilities, _, geocoded_facilities = count_facilities()
         
         if total_facilities > 0:
             geocoded_percentage = round((geocoded_facilities / total_facilities) * 100)
@@ -1083,6 +1684,10 @@ Preferred-Languages: it, en
         
         # Inizia la query
         query = db.session.query(MedicalFacility)
+        if specialty:
+            # Le specialità servono per il rating specifico: caricale tutte in un'unica query
+            # (ogni FacilitySpecialty insieme alla sua Specialty, con un JOIN)
+            query = query.options(selectinload(MedicalFacility.specialties).joinedload(FacilitySpecialty.specialty))
         
         # Filtra solo le strutture con coordinate valide
         query = query.filter(
@@ -1099,8 +1704,9 @@ Preferred-Languages: it, en
             query = query.join(MedicalFacility.specialties).join(FacilitySpecialty.specialty)
             query = query.filter(Specialty.name == specialty)
             
-        # Esegui la query
-        facilities = query.all()
+        # Esegui la query a blocchi di 500 righe: gli oggetti di un blocco vengono
+        # rilasciati una volta convertiti, invece di tenerli tutti in memoria
+        facilities = query.yield_per(500)
         
         # Prepara i dati per la risposta
         data = []
@@ -1126,7 +1732,7 @@ Preferred-Languages: it, en
             data.append(facility_data)
             
         return jsonify({
-            'count': len(facilities),
+            'count': len(data),
             'facilities': data
         })
     
@@ -1136,27 +1742,72 @@ Preferred-Languages: it, en
         # Redirect to the search page with the same parameters
         return redirect(url_for('search', region=region, specialty=specialty))
     
-    # Add dynamic structured data (JSON-LD) to all pages
-    @app.context_processor
-    def inject_json_ld():
-        """Inject JSON-LD structured data into all templates"""
-        def get_structured_data():
-            # Default data for website (homepage and general pages)
-            current_path = request.path
-            
-            # Base data for all pages
+    # Pages with their own structured data; every other page gets the website data
+    STRUCTURED_DATA_PATHS = frozenset({
+        '/search', '/methodology', '/cardiologia', '/oncologia', '/milano-strutture-sanitarie'
+    })
+
+    @lru_cache(maxsize=256)
+    def _build_structured_data(current_path, query='', specialty='', region=''):
+        """
+        Build the JSON-LD structured data of a page, serialized for a <script> tag.
+        
+        The data only depends on the path (and the search parameters of
+        /search), so each variant is built and serialized once.
+        
+        Args:
+            current_path: The page path, '' for the pages without their own data
+            query, specialty, region: The search parameters (only used by /search)
+        
+        Returns:
+            Markup: The HTML-safe JSON
+        """
+        # Base data for all pages
+        base_data = [
+            {
+                "@context": "https://schema.org",
+                "@type": "WebSite",
+                "name": "FindMyCure Italia",
+                "url": "https://findmycure.it/",
+                "description": "Trova e confronta strutture sanitarie in Italia con valutazioni reali basate su dati ufficiali.",
+                "potentialAction": {
+                    "@type": "SearchAction",
+                    "target": "https://findmycure.it/search?query_text={search_term}",
+                    "query-input": "required name=search_term"
+                }
+            },
+            {
+                "@context": "https://schema.org",
+                "@type": "Organization",
+                "name": "FindMyCure Italia",
+                "url": "https://findmycure.it/",
+                "logo": {
+                    "@type": "ImageObject",
+                    "url": "https://findmycure.it/static/images/logo-cross-112.png",
+                    "width": "112",
+                    "height": "112"
+                },
+                "description": "FindMyCure Italia - Trova e confronta strutture sanitarie in Italia con valutazioni reali basate su dati ufficiali."
+            }
+        ]
+        
+        # Enhanced structured data for search results pages
+        if current_path == '/search':
+            # Customize page title based on search parameters
+            search_title = "Risultati della ricerca"
+            if query:
+                search_title = f"Strutture per '{query}'"
+            elif specialty:
+                search_title = f"Strutture di {specialty}"
+            if region:
+                search_title += f" in {region}"
+                
             base_data = [
                 {
                     "@context": "https://schema.org",
-                    "@type": "WebSite",
-                    "name": "FindMyCure Italia",
-                    "url": "https://findmycure.it/",
-                    "description": "Trova e confronta strutture sanitarie in Italia con valutazioni reali basate su dati ufficiali.",
-                    "potentialAction": {
-                        "@type": "SearchAction",
-                        "target": "https://findmycure.it/search?query_text={search_term}",
-                        "query-input": "required name=search_term"
-                    }
+                    "@type": "SearchResultsPage",
+                    "name": f"FindMyCure Italia - {search_title}",
+                    "description": f"Risultati della ricerca per strutture sanitarie in Italia: {search_title}"
                 },
                 {
                     "@context": "https://schema.org",
@@ -1168,35 +1819,20 @@ Preferred-Languages: it, en
                         "url": "https://findmycure.it/static/images/logo-cross-112.png",
                         "width": "112",
                         "height": "112"
-                    },
-                    "description": "FindMyCure Italia - Trova e confronta strutture sanitarie in Italia con valutazioni reali basate su dati ufficiali."
+                    }
                 }
             ]
-            
-            # Enhanced structured data for search results pages
-            if current_path == '/search':
-                query = request.args.get('query_text', '')
-                specialty = request.args.get('specialty', '')
-                region = request.args.get('region', '')
-                
-                # Customize page title based on search parameters
-                search_title = "Risultati della ricerca"
-                if query:
-                    search_title = f"Strutture per '{query}'"
-                elif specialty:
-                    search_title = f"Strutture di {specialty}"
-                if region:
-                    search_title += f" in {region}"
-                    
-                base_data = [
-                    {
-                        "@context": "https://schema.org",
-                        "@type": "SearchResultsPage",
-                        "name": f"FindMyCure Italia - {search_title}",
-                        "description": f"Risultati della ricerca per strutture sanitarie in Italia: {search_title}"
-                    },
-                    {
-                        "@context": "https://schema.org",
+        
+        # Enhanced structured data for methodology page
+        elif current_path == '/methodology':
+            base_data = [
+                {
+                    "@context": "https://schema.org",
+                    "@type": "Article",
+                    "headline": "Metodologia di valutazione delle strutture sanitarie",
+                    "description": "Scopri come valutiamo le strutture sanitarie italiane usando dati ufficiali del Programma Nazionale Esiti (PNE) e altre fonti verificate",
+                    "datePublished": "2025-04-09",
+                    "publisher": {
                         "@type": "Organization",
                         "name": "FindMyCure Italia",
                         "url": "https://findmycure.it/",
@@ -1207,31 +1843,62 @@ Preferred-Languages: it, en
                             "height": "112"
                         }
                     }
-                ]
+                },
+                {
+                    "@context": "https://schema.org",
+                    "@type": "Organization",
+                    "name": "FindMyCure Italia",
+                    "url": "https://findmycure.it/",
+                    "logo": {
+                        "@type": "ImageObject",
+                        "url": "https://findmycure.it/static/images/logo-cross-112.png",
+                        "width": "112",
+                        "height": "112"
+                    }
+                }
+            ]
+        
+        # Enhanced structured data for landing pages
+        elif current_path in ['/cardiologia', '/oncologia', '/milano-strutture-sanitarie']:
+            page_info = {
+                '/cardiologia': {
+                    "name": "Strutture di Cardiologia in Italia",
+                    "specialty": "Cardiologia",
+                    "type": "MedicalWebPage"
+                },
+                '/oncologia': {
+                    "name": "Strutture di Oncologia in Italia",
+                    "specialty": "Oncologia",
+                    "type": "MedicalWebPage"
+                },
+                '/milano-strutture-sanitarie': {
+                    "name": "Strutture Sanitarie a Milano",
+                    "city": "Milano",
+                    "type": "MedicalWebPage"
+                }
+            }
             
-            # Enhanced structured data for methodology page
-            elif current_path == '/methodology':
-                base_data = [
-                    {
-                        "@context": "https://schema.org",
-                        "@type": "Article",
-                        "headline": "Metodologia di valutazione delle strutture sanitarie",
-                        "description": "Scopri come valutiamo le strutture sanitarie italiane usando dati ufficiali del Programma Nazionale Esiti (PNE) e altre fonti verificate",
-                        "datePublished": "2025-04-09",
-                        "publisher": {
-                            "@type": "Organization",
-                            "name": "FindMyCure Italia",
-                            "url": "https://findmycure.it/",
-                            "logo": {
-                                "@type": "ImageObject",
-                                "url": "https://findmycure.it/static/images/logo-cross-112.png",
-                                "width": "112",
-                                "height": "112"
-                            }
+            info = page_info[current_path]
+            
+            # Utilizza il tipo di pagina corretto in base alle informazioni
+            page_type = info.get("type", "MedicalWebPage")
+            
+            base_data = [
+                {
+                    "@context": "https://schema.org",
+                    "@type": page_type,
+                    "headline": info["name"],
+                    "specialty": info.get("specialty", ""),
+                    "about": {
+                        "@type": "MedicalOrganization",
+                        "name": "Strutture mediche italiane",
+                        "address": {
+                            "@type": "PostalAddress",
+                            "addressCountry": "IT",
+                            "addressRegion": info.get("city", "Italia")
                         }
                     },
-                    {
-                        "@context": "https://schema.org",
+                    "publisher": {
                         "@type": "Organization",
                         "name": "FindMyCure Italia",
                         "url": "https://findmycure.it/",
@@ -1242,75 +1909,37 @@ Preferred-Languages: it, en
                             "height": "112"
                         }
                     }
-                ]
-            
-            # Enhanced structured data for landing pages
-            elif current_path in ['/cardiologia', '/oncologia', '/milano-strutture-sanitarie']:
-                page_info = {
-                    '/cardiologia': {
-                        "name": "Strutture di Cardiologia in Italia",
-                        "specialty": "Cardiologia",
-                        "type": "MedicalWebPage"
-                    },
-                    '/oncologia': {
-                        "name": "Strutture di Oncologia in Italia",
-                        "specialty": "Oncologia",
-                        "type": "MedicalWebPage"
-                    },
-                    '/milano-strutture-sanitarie': {
-                        "name": "Strutture Sanitarie a Milano",
-                        "city": "Milano",
-                        "type": "MedicalWebPage"
+                },
+                {
+                    "@context": "https://schema.org",
+                    "@type": "Organization",
+                    "name": "FindMyCure Italia",
+                    "url": "https://findmycure.it/",
+                    "logo": {
+                        "@type": "ImageObject",
+                        "url": "https://findmycure.it/static/images/logo-cross-112.png",
+                        "width": "112",
+                        "height": "112"
                     }
                 }
-                
-                info = page_info[current_path]
-                
-                # Utilizza il tipo di pagina corretto in base alle informazioni
-                page_type = info.get("type", "MedicalWebPage")
-                
-                base_data = [
-                    {
-                        "@context": "https://schema.org",
-                        "@type": page_type,
-                        "headline": info["name"],
-                        "specialty": info.get("specialty", ""),
-                        "about": {
-                            "@type": "MedicalOrganization",
-                            "name": "Strutture mediche italiane",
-                            "address": {
-                                "@type": "PostalAddress",
-                                "addressCountry": "IT",
-                                "addressRegion": info.get("city", "Italia")
-                            }
-                        },
-                        "publisher": {
-                            "@type": "Organization",
-                            "name": "FindMyCure Italia",
-                            "url": "https://findmycure.it/",
-                            "logo": {
-                                "@type": "ImageObject",
-                                "url": "https://findmycure.it/static/images/logo-cross-112.png",
-                                "width": "112",
-                                "height": "112"
-                            }
-                        }
-                    },
-                    {
-                        "@context": "https://schema.org",
-                        "@type": "Organization",
-                        "name": "FindMyCure Italia",
-                        "url": "https://findmycure.it/",
-                        "logo": {
-                            "@type": "ImageObject",
-                            "url": "https://findmycure.it/static/images/logo-cross-112.png",
-                            "width": "112",
-                            "height": "112"
-                        }
-                    }
-                ]
-                
-            return base_data
+            ]
+            
+        return htmlsafe_json_dumps(base_data, dumps=app.json.dumps)
+
+    # Add dynamic structured data (JSON-LD) to all pages
+    @app.context_processor
+    def inject_json_ld():
+        """Inject JSON-LD structured data into all templates"""
+        def get_structured_data():
+            current_path = request.path
+            if current_path == '/search':
+                return _build_structured_data(
+                    current_path,
+                    request.args.get('query_text', ''),
+                    request.args.get('specialty', ''),
+                    request.args.get('region', '')
+                )
+            return _build_structured_data(current_path if current_path in STRUCTURED_DATA_PATHS else '')
             
         return dict(get_structured_data=get_structured_data)
         
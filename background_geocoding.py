@@ -7,11 +7,13 @@ It periodically checks for facilities that need geocoding and processes them in
 small batches to avoid hitting API rate limits.
 
 Usage:
-  python background_geocoding.py [--continuous] [--batch-size=N] [--delay=S]
+  python background_geocoding.py [--continuous] [--batch-size=N] [--once] [--delay=S] [--job-id=ID]
   
   --continuous: Run continuously, checking for new facilities to geocode
   --batch-size=N: Process N facilities at a time (default: 5)
+  --once: Process a single batch and exit
   --delay=S: Sleep S seconds between batches (default: 60)
+  --job-id=ID: BackgroundJob the outcome is recorded in (set by the web interface)
 """
 
 import time
@@ -21,6 +23,7 @@ import signal
 import sys
 from app import app
 from geocode_facilities import geocode_facilities, get_geocoding_statistics
+from models import BackgroundJob
 
 # Set up logging
 logging.basicConfig(
@@ -44,7 +47,7 @@ def signal_handler(sig, frame):
     logger.info("Received termination signal. Finishing current batch then exiting...")
     running = False
 
-def run_geocoder(batch_size=DEFAULT_BATCH_SIZE, delay=DEFAULT_DELAY, continuous=False):
+def run_geocoder(batch_size=DEFAULT_BATCH_SIZE, delay=DEFAULT_DELAY, continuous=False, once=False):
     """
     Run the geocoder in a background process
     
@@ -52,8 +55,13 @@ def run_geocoder(batch_size=DEFAULT_BATCH_SIZE, delay=DEFAULT_DELAY, continuous=
         batch_size: Number of facilities to process in each batch
         delay: Seconds to wait between batches
         continuous: Whether to run continuously or just once
+        once: Process a single batch and exit (used by the web interface)
+    
+    Returns:
+        int: Exit code (0 on success, 1 on error)
     """
-    logger.info(f"Starting background geocoder with batch_size={batch_size}, delay={delay}s, continuous={continuous}")
+    exit_code = 0
+    logger.info(f"Starting background geocoder with batch_size={batch_size}, delay={delay}s, continuous={continuous}, once={once}")
     
     try:
         # Get initial statistics
@@ -65,6 +73,10 @@ def run_geocoder(batch_size=DEFAULT_BATCH_SIZE, delay=DEFAULT_DELAY, continuous=
             logger.info(f"Processing batch of up to {batch_size} facilities...")
             result = geocode_facilities(batch_size=batch_size, max_facilities=batch_size)
             
+            if once:
+                logger.info("Single batch complete. Exiting.")
+                break
+            
             # Check if we have more facilities to process
             stats = get_geocoding_statistics()
             facilities_remaining = stats['total'] - stats['geocoded']
@@ -86,8 +98,10 @@ def run_geocoder(batch_size=DEFAULT_BATCH_SIZE, delay=DEFAULT_DELAY, continuous=
         logger.info("Interrupted by user. Exiting...")
     except Exception as e:
         logger.exception(f"Error in background geocoder: {str(e)}")
+        exit_code = 1
     
     logger.info("Background geocoder stopped")
+    return exit_code
 
 if __name__ == "__main__":
     # Handle signals
@@ -98,8 +112,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Background geocoding process")
     parser.add_argument("--continuous", action="store_true", help="Run continuously, checking for new facilities")
     parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Facilities per batch (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--once", action="store_true", help="Process a single batch and exit")
     parser.add_argument("--delay", type=int, default=DEFAULT_DELAY, help=f"Seconds between batches (default: {DEFAULT_DELAY})")
+    parser.add_argument("--job-id", help="BackgroundJob to record the outcome in (set by the web interface)")
     
     args = parser.parse_args()
     
-    run_geocoder(batch_size=args.batch_size, delay=args.delay, continuous=args.continuous)
\ No newline at end of file
+    exit_code = run_geocoder(batch_size=args.batch_size, delay=args.delay, continuous=args.continuous, once=args.once)
+    if args.job_id:
+        with app.app_context():
+            BackgroundJob.finish(args.job_id, exit_code == 0)
+    sys.exit(exit_code)
\ No newline at end of file
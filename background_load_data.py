@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Background Data Loading Script
+
+This script loads one batch of regions (see data_loader.load_data) outside of
+the web request cycle. It is started by the /load-data route so that the web
+worker is not blocked for the whole duration of the load.
+
+Usage:
+  python background_load_data.py [--batch=N] [--job-id=ID]
+
+  --batch=N: Batch of regions to load, 0-3 (default: 0). Batch 0 clears the database first.
+  --job-id=ID: BackgroundJob the outcome is recorded in (set by the /load-data route)
+"""
+
+import argparse
+import logging
+import sys
+from app import app
+from data_loader import load_data
+from models import DatabaseStatus, BackgroundJob, MedicalFacility, Region, Specialty
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler('data_loading.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def run_loader(batch=0):
+    """
+    Load a batch of data in a background process
+
+    Args:
+        batch: Batch of regions to load
+
+    Returns:
+        int: Exit code (0 on success, 1 on error)
+    """
+    logger.info(f"Starting background data load for batch {batch}")
+
+    try:
+        with app.app_context():
+            stats = load_data(batch=batch)
+            # A new status row also tells the web workers to drop their cached
+            # regions, specialties and home page
+            DatabaseStatus.update_status(
+                "initialized",
+                total_facilities=MedicalFacility.query.count(),
+                total_regions=Region.query.count(),
+                total_specialties=Specialty.query.count(),
+                notes=f"Loaded batch {batch}: {stats['total']} facilities from {stats['regions']} regions",
+                initialized_by="background_load_data.py"
+            )
+        logger.info(f"Batch {batch} loaded: {stats['total']} facilities from {stats['regions']} regions")
+        return 0
+    except Exception as e:
+        logger.exception(f"Error loading data batch {batch}: {str(e)}")
+        try:
+            with app.app_context():
+                DatabaseStatus.update_status(
+                    "error",
+                    notes=f"Error loading batch {batch}: {str(e)}"[:500],
+                    initialized_by="background_load_data.py"
+                )
+        except Exception:
+            logger.exception("Could not record the database status")
+        return 1
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Background data loading process")
+    parser.add_argument("--batch", type=int, default=0, help="Batch of regions to load (default: 0)")
+    parser.add_argument("--job-id", help="BackgroundJob to record the outcome in (set by the web interface)")
+
+    args = parser.parse_args()
+
+    exit_code = run_loader(batch=args.batch)
+    if args.job_id:
+        with app.app_context():
+            BackgroundJob.finish(args.job_id, exit_code == 0)
+    sys.exit(exit_code)
@@ -7,11 +7,13 @@ and compresses them into a timestamped ZIP archive.
 """
 
 import os
+import io
 import csv
 import zipfile
 import datetime
 from contextlib import closing
 import logging
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app import app, db
 from models import MedicalFacility, Region, Specialty, FacilitySpecialty
@@ -20,14 +22,14 @@ from models import MedicalFacility, Region, Specialty, FacilitySpecialty
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Records fetched from the database at a time while exporting a table
+EXPORT_BATCH_SIZE = 1000
+
 def backup_database():
     """Export the entire database to a timestamped ZIP archive of CSV files"""
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_dir = f"database_backup_{timestamp}"
-    
-    # Create a directory for the backup
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
+    zip_filename = f"{backup_dir}.zip"
     
     try:
         # Back up each table to a CSV file
@@ -38,66 +40,47 @@ def backup_database():
             'facility_specialties': FacilitySpecialty
         }
         
-        # Export each table
-        with Session(db.engine) as session:
+        # Write each table straight into its entry of the ZIP archive, under the
+        # backup folder name restore_database.py expects, without temporary files
+        with Session(db.engine) as session, zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for table_name, model in tables.items():
-                export_table_to_csv(session, model, f"{backup_dir}/{table_name}.csv")
-        
-        # Create a ZIP archive of all the CSV files
-        zip_filename = f"database_backup_{timestamp}.zip"
-        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(backup_dir):
-                for file in files:
-                    zipf.write(os.path.join(root, file), 
-                              os.path.relpath(os.path.join(root, file), 
-                                             os.path.join(backup_dir, '..')))
+                with zipf.open(f"{backup_dir}/{table_name}.csv", 'w', force_zip64=True) as member:
+                    with io.TextIOWrapper(member, encoding='utf-8', newline='') as f:
+                        export_table_to_csv(session, model, f)
         
         logger.info(f"Database backup completed: {zip_filename}")
         return zip_filename
     
     except Exception as e:
         logger.error(f"Error backing up database: {e}")
+        # Do not leave a truncated archive behind
+        if os.path.exists(zip_filename):
+            os.remove(zip_filename)
         raise
-    finally:
-        # Clean up the temporary directory
-        import shutil
-        if os.path.exists(backup_dir):
-            shutil.rmtree(backup_dir)
 
-def export_table_to_csv(session, model, output_file):
-    """Export a table to a CSV file"""
-    logger.info(f"Exporting {model.__tablename__} to {output_file}")
+def export_table_to_csv(session, model, f):
+    """Export a table to an open CSV text file"""
+    logger.info(f"Exporting {model.__tablename__}")
     
     try:
-        # Get all records from the table
-        records = session.query(model).all()
+        columns = [c.name for c in model.__table__.columns]
         
-        if not records:
-            logger.warning(f"No records found in {model.__tablename__}")
-            return
-        
-        # Get the column names from the first record
-        if hasattr(records[0], '__table__'):
-            columns = [c.name for c in records[0].__table__.columns]
-        else:
-            # Try to get attributes from the first record
-            columns = [k for k in records[0].__dict__.keys() if not k.startswith('_')]
+        writer = csv.writer(f)
+        writer.writerow(columns)
         
-        # Write the records to a CSV file
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(columns)
-            
-            for record in records:
-                row = []
-                for column in columns:
-                    if hasattr(record, column):
-                        row.append(getattr(record, column))
-                    else:
-                        row.append(None)
-                writer.writerow(row)
+        # Stream plain row tuples in batches (server-side cursor on PostgreSQL):
+        # no ORM objects are built and the table is never loaded as a whole
+        record_count = 0
+        result = session.execute(
+            select(model.__table__).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for rows in result.partitions():
+            writer.writerows(rows)
+            record_count += len(rows)
         
-        logger.info(f"Exported {len(records)} records to {output_file}")
+        if not record_count:
+            logger.warning(f"No records found in {model.__tablename__}")
+        logger.info(f"Exported {record_count} records from {model.__tablename__}")
     
     except Exception as e:
         logger.error(f"Error exporting {model.__tablename__} to CSV: {e}")
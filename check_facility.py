@@ -1,12 +1,16 @@
 """Check facility data for a specific facility"""
 
+from sqlalchemy.orm import selectinload
 from app import app, db
-from models import MedicalFacility
+from models import MedicalFacility, FacilitySpecialty
 
 def check_facility():
     """Check facility data for 'Ospedale SS. Annunziata'"""
     try:
-        facility = MedicalFacility.query.filter(MedicalFacility.name == 'Ospedale SS. Annunziata').first()
+        # The rating properties walk the facility's specialties: load them with the facility
+        facility = MedicalFacility.query.options(
+            selectinload(MedicalFacility.specialties).joinedload(FacilitySpecialty.specialty)
+        ).filter(MedicalFacility.name == 'Ospedale SS. Annunziata').first()
         
         if facility:
             print(f'Facility: {facility.name}')
@@ -6,9 +6,11 @@ from io import StringIO
 import csv
 import math
 import random
+from functools import lru_cache
 from app import db
 from models import MedicalFacility, Specialty, FacilitySpecialty, Region
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
 import re
 from unidecode import unidecode
 import web_scraper
@@ -290,6 +292,7 @@ SPECIALTY_MAPPING = {
     'fisioter': 'Fisioterapia'
 }
 
+@lru_cache(maxsize=1024)
 def normalize_specialty(specialty_name):
     """Normalize specialty names to standard format"""
     if not specialty_name:
@@ -347,6 +350,36 @@ def safe_get(df, row_idx, col_name, default=None):
     except (KeyError, IndexError):
         return default
 
+# INSERT ... ON CONFLICT DO NOTHING constructs of the dialects that support it
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+def insert_missing_names(model, names):
+    """
+    Insert the given names into a table with a unique name column, skipping
+    the ones that already exist, and commit.
+    
+    PostgreSQL and SQLite insert them in a single ON CONFLICT DO NOTHING
+    statement; other databases read the existing names first and insert the
+    missing ones.
+    
+    Args:
+        model: Region or Specialty
+        names: The names to insert
+    """
+    dialect_insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(model).values([{'name': name} for name in names])
+        db.session.execute(stmt.on_conflict_do_nothing(index_elements=['name']))
+    else:
+        existing = set(db.session.scalars(db.select(model.name).where(model.name.in_(names))))
+        missing = [{'name': name} for name in dict.fromkeys(names) if name not in existing]
+        if missing:
+            db.session.execute(db.insert(model), missing)
+    db.session.commit()
+
 def get_or_create_region(region_name):
     """Get or create a region by name"""
     if not region_name:
@@ -1395,17 +1428,17 @@ def load_data(batch=0):
         "Ortopedia", "Ginecologia", "Dermatologia", "Oculistica"
     ]
     
+    # Insert the specialties in a single statement, like the regions below; on
+    # later batches they already exist and are only read back
     specialties = {}
-    for name in specialty_names:
-        try:
-            specialty = Specialty(name=name)
-            db.session.add(specialty)
-            db.session.commit()
-            specialties[name] = specialty
-            logger.info(f"Added specialty: {name}")
-        except Exception as e:
-            logger.error(f"Error adding specialty {name}: {str(e)}")
-            db.session.rollback()
+    try:
+        insert_missing_names(Specialty, specialty_names)
+        
+        specialties = {sp.name: sp for sp in Specialty.query.filter(Specialty.name.in_(specialty_names)).all()}
+        logger.info(f"Added specialties: {', '.join(specialties)}")
+    except Exception as e:
+        logger.error(f"Error adding specialties: {str(e)}")
+        db.session.rollback()
     
     # If web scraping is enabled, try to get real data first
     if USE_WEB_SCRAPING:
@@ -1540,17 +1573,18 @@ def load_data(batch=0):
     logger.info("Adding regions with special characters (Group 4)")
     region_names.extend(special_regions)
     
+    # Insert all regions in a single statement; names that already exist are
+    # skipped by the unique index instead of being checked one by one
     regions = {}
-    for name in region_names:
-        try:
-            region = Region(name=name)
-            db.session.add(region)
-            db.session.commit()
-            regions[name] = region
-            logger.info(f"Added region: {name}")
-        except Exception as e:
-            logger.error(f"Error adding region {name}: {str(e)}")
-            db.session.rollback()
+    try:
+        insert_missing_names(Region, region_names)
+        
+        regions_by_name = {r.name: r for r in Region.query.filter(Region.name.in_(region_names)).all()}
+        regions = {name: regions_by_name[name] for name in region_names if name in regions_by_name}
+        logger.info(f"Added regions: {', '.join(regions)}")
+    except Exception as e:
+        logger.error(f"Error adding regions: {str(e)}")
+        db.session.rollback()
     
     # Facility types
     facility_types = [
@@ -1569,95 +1603,44 @@ def load_data(batch=0):
         # Create more facilities for each region for comprehensive data
         num_facilities = random.randint(15, 20)
         
+        facility_rows = []
         for i in range(num_facilities):
-            try:
-                # Basic facility info
-                facility_type = facility_types[i % len(facility_types)]
-                name = f"{facility_type} {region_name} {i+1}"
-                address = f"Via {region_name} {i+1}"
-                city = f"{region_name} Centro"
-                
-                # Add random quality
-                quality = round(random.uniform(2.5, 5.0), 1)
-                
-                # Create the facility - with robust error handling
-                try:
-                    # Create in a separate transaction to isolate potential failures
-                    facility = MedicalFacility(
-                        name=name,
-                        address=address,
-                        city=city,
-                        region_id=region.id,
-                        facility_type=facility_type,
-                        telephone=f"0{random.randint(10, 99)} {random.randint(1000000, 9999999)}",
-                        data_source="Sample Data",
-                        attribution="FindMyCure Italia",
-                        quality_score=quality
-                    )
-                    
-                    db.session.add(facility)
-                    db.session.flush()  # Check for errors before commit
-                    db.session.commit()
-                    
-                    # Quick sanity check - confirm we can retrieve the facility
-                    facility_check = MedicalFacility.query.get(facility.id)
-                    if not facility_check:
-                        raise Exception(f"Failed to retrieve newly created facility with ID {facility.id}")
-                        
-                except Exception as e:
-                    logger.error(f"Failed to create facility {name} for {region_name}: {str(e)}")
-                    db.session.rollback()
-                    # Skip to next facility on failure
-                    continue
-                
-                # Add only 1-2 specialties to each facility to minimize database load
-                try:
-                    num_specialties = random.randint(1, 2)
-                    specialty_keys = list(specialties.keys())
-                    random.shuffle(specialty_keys)
-                    
-                    # Add all specialties in a single transaction
-                    specialties_added = 0
-                    
-                    for j in range(min(num_specialties, len(specialty_keys))):
-                        try:
-                            specialty_name = specialty_keys[j]
-                            specialty = specialties[specialty_name]
-                            
-                            # Link the specialty to the facility
-                            facility_specialty = FacilitySpecialty(
-                                facility_id=facility.id,
-                                specialty_id=specialty.id
-                            )
-                            
-                            db.session.add(facility_specialty)
-                            # Don't commit yet - flush to check for errors
-                            db.session.flush()
-                            specialties_added += 1
-                            
-                        except Exception as specialty_err:
-                            # Use a default name if specialty_name is not defined in the exception handler
-                            error_specialty = specialty_name if 'specialty_name' in locals() else "unknown"
-                            # Log but continue with next specialty on error
-                            logger.error(f"Error adding specialty {error_specialty} to facility: {str(specialty_err)}")
-                            db.session.rollback()
-                            continue
-                            
-                    # Only commit once all specialties have been added
-                    if specialties_added > 0:
-                        db.session.commit()
-                        logger.info(f"Added {specialties_added} specialties to facility {name}")
-                
-                except Exception as e:
-                    logger.error(f"Error adding specialties to facility {name}: {str(e)}")
-                    db.session.rollback()
-                
-                facilities_added += 1
-                logger.info(f"Added facility {name} for {region_name}")
-                
-            except Exception as e:
-                logger.error(f"Error adding facility for {region_name}: {str(e)}")
-                db.session.rollback()
+            facility_type = facility_types[i % len(facility_types)]
+            facility_rows.append({
+                'name': f"{facility_type} {region_name} {i+1}",
+                'address': f"Via {region_name} {i+1}",
+                'city': f"{region_name} Centro",
+                'region_id': region.id,
+                'facility_type': facility_type,
+                'telephone': f"0{random.randint(10, 99)} {random.randint(1000000, 9999999)}",
+                'data_source': "Sample Data",
+                'attribution': "FindMyCure Italia",
+                'quality_score': round(random.uniform(2.5, 5.0), 1)  # Random quality between 2.5-5.0
+            })
+        
+        # Insert the region's facilities and their specialties with one
+        # executemany each and commit once, instead of a commit (and a
+        # read-back) per facility and a flush per specialty
+        try:
+            facility_ids = db.session.scalars(
+                db.insert(MedicalFacility).returning(MedicalFacility.id, sort_by_parameter_order=True),
+                facility_rows
+            ).all()
+            
+            # Add only 1-2 specialties to each facility to minimize database load
+            specialty_rows = []
+            for facility_id in facility_ids:
+                num_specialties = min(random.randint(1, 2), len(specialties))
+                for specialty in random.sample(list(specialties.values()), num_specialties):
+                    specialty_rows.append({'facility_id': facility_id, 'specialty_id': specialty.id})
+            if specialty_rows:
+                db.session.execute(db.insert(FacilitySpecialty), specialty_rows)
+            
+            db.session.commit()
+            facilities_added = len(facility_ids)
+        except Exception as e:
+            logger.error(f"Error adding facilities for {region_name}: {str(e)}")
+            db.session.rollback()
         
         # Update stats
         if facilities_added > 0:
@@ -9,11 +9,92 @@ Usage:
 """
 
 import os
+import io
 import datetime
 import csv
+import logging
 import zipfile
-from sqlalchemy import create_engine, MetaData, Table
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, MetaData, select
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the database at a time while writing a table
+EXPORT_BATCH_SIZE = 1000
+
+# Table definitions reflected from each engine's database, so that repeated
+# exports (one per /download-db request) do not reflect the schema again
+_reflected_metadata = {}
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, unseekable buffer collecting the bytes written by ZipFile until they are taken"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        """Return and forget the bytes written so far"""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def reflect_tables(engine):
+    """
+    Return the MetaData of all the tables in the engine's database, reflected once per engine
+    
+    Args:
+        engine: The SQLAlchemy engine of the database
+        
+    Returns:
+        MetaData: The reflected tables
+    """
+    metadata = _reflected_metadata.get(engine)
+    if metadata is None:
+        metadata = MetaData()
+        metadata.reflect(bind=engine)
+        _reflected_metadata[engine] = metadata
+    return metadata
+
+def iter_database_zip(engine):
+    """
+    Export the database tables to CSV files inside a zip archive, generated in chunks
+    
+    The archive is written to an unseekable buffer (zipfile then uses data
+    descriptors) and each table is read in batches of EXPORT_BATCH_SIZE rows,
+    so neither the rows nor the archive are ever held in memory as a whole.
+    
+    Args:
+        engine: The SQLAlchemy engine of the database to export
+        
+    Yields:
+        bytes: The next chunk of the zip archive
+    """
+    metadata = reflect_tables(engine)
+    
+    buffer = _ChunkBuffer()
+    with engine.connect() as conn, zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        # Export each table to a CSV file
+        for table_name, table in metadata.tables.items():
+            with zipf.open(f"{table_name}.csv", 'w', force_zip64=True) as member:
+                with io.TextIOWrapper(member, encoding='utf-8', newline='') as csvfile:
+                    row_count = 0
+                    for rows in export_table_to_csv(conn, table, csvfile):
+                        row_count += rows
+                        csvfile.flush()
+                        # The compressor holds back small batches: only send actual bytes
+                        chunk = buffer.take()
+                        if chunk:
+                            yield chunk
+            logger.info("Exported %s rows from %s", row_count, table_name)
+    
+    # Central directory, written when the archive is closed
+    yield buffer.take()
 
 def export_database():
     """Export the database tables to CSV files and compress them into a zip file"""
@@ -27,31 +108,16 @@ def export_database():
         return None
     
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = f"medical_facilities_export_{timestamp}"
-    output_zip = f"{output_dir}.zip"
-    
-    # Create directory for export files
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    output_zip = f"medical_facilities_export_{timestamp}.zip"
     
     try:
         # Connect to the database
         engine = create_engine(db_url)
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        # Export each table to a CSV file
-        for table_name, table in metadata.tables.items():
-            export_table_to_csv(session, table, os.path.join(output_dir, f"{table_name}.csv"))
         
-        # Create a zip file containing all CSV files
-        with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(output_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zipf.write(file_path, os.path.relpath(file_path, output_dir))
+        # Write the archive chunk by chunk
+        with open(output_zip, 'wb') as f:
+            for chunk in iter_database_zip(engine):
+                f.write(chunk)
         
         print(f"Database successfully exported to {output_zip}")
         print(f"File size: {os.path.getsize(output_zip) / (1024*1024):.2f} MB")
@@ -61,28 +127,29 @@ def export_database():
         print(f"Error exporting database: {e}")
         return None
 
-def export_table_to_csv(session, table, output_file):
-    """Export a table to a CSV file"""
-    print(f"Exporting table {table.name} to {output_file}...")
+def export_table_to_csv(conn, table, csvfile):
+    """
+    Export a table to a CSV file
     
-    # Get column names
-    column_names = [column.name for column in table.columns]
-    
-    # Query all data from the table
-    query = session.query(table).all()
-    
-    # Write data to CSV
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(column_names)  # Write header
+    Args:
+        conn: The database connection
+        table: The table to export
+        csvfile: The text file the CSV rows are written to
         
-        for row in query:
-            # Convert row to a dictionary
-            row_dict = {col: getattr(row, col) for col in column_names}
-            # Write row data
-            writer.writerow([row_dict[col] for col in column_names])
+    Yields:
+        int: The number of rows written by each batch
+    """
+    logger.info("Exporting table %s...", table.name)
+    
+    writer = csv.writer(csvfile)
+    writer.writerow([column.name for column in table.columns])  # Write header
     
-    print(f"Exported {len(query)} rows from {table.name}")
+    # Stream the rows from a server-side cursor instead of fetching the whole table
+    result = conn.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(select(table))
+    for rows in result.partitions():
+        writer.writerows(rows)
+        yield len(rows)
 
 if __name__ == "__main__":
-    export_database()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    export_database()
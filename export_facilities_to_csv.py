@@ -7,8 +7,9 @@ including the specialty ratings and strengths summary.
 
 import csv
 import logging
+from sqlalchemy.orm import contains_eager, selectinload
 from app import app, db
-from models import MedicalFacility, Region
+from models import MedicalFacility, Region, FacilitySpecialty
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -19,8 +20,12 @@ def export_facilities_to_csv(filename="updated_medical_facilities.csv"):
     try:
         logger.info(f"Exporting medical facilities to {filename}")
         
-        # Query all facilities with region joined
-        facilities = db.session.query(MedicalFacility).join(Region).all()
+        # Query all facilities with region joined; the region comes from the join and the
+        # specialties read by the rating columns from one IN query, not one query per facility
+        facilities = db.session.query(MedicalFacility).join(Region).options(
+            contains_eager(MedicalFacility.region),
+            selectinload(MedicalFacility.specialties).joinedload(FacilitySpecialty.specialty)
+        ).all()
         
         logger.info(f"Found {len(facilities)} facilities to export")
         
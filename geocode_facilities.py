@@ -66,7 +66,6 @@ def geocode_facilities(batch_size=None, max_facilities=None):
                     # Skip facilities that already have coordinates
                     if facility.latitude is not None and facility.longitude is not None:
                         facility.geocoded = True
-                        db.session.commit()
                         logger.info(f"Facility already has coordinates: {facility.name}")
                         total_processed += 1
                         total_success += 1
@@ -80,7 +79,6 @@ def geocode_facilities(batch_size=None, max_facilities=None):
                         facility.latitude = coords['lat']
                         facility.longitude = coords['lon']
                         facility.geocoded = True
-                        db.session.commit()
                         
                         logger.info(f"Successfully geocoded: {facility.name} ({facility.address}, {facility.city})")
                         total_success += 1
@@ -88,7 +86,6 @@ def geocode_facilities(batch_size=None, max_facilities=None):
                         logger.warning(f"Failed to geocode: {facility.name} ({facility.address}, {facility.city})")
                         # Mark as geocoded but with no coordinates to avoid repeated attempts
                         facility.geocoded = True
-                        db.session.commit()
                     
                     # Respect rate limits
                     time.sleep(GEOCODING_DELAY)
@@ -105,6 +102,13 @@ def geocode_facilities(batch_size=None, max_facilities=None):
                     success_rate = (total_success / total_processed) * 100 if total_processed > 0 else 0
                     logger.info(f"Progress: {total_processed}/{total_facilities} facilities processed ({success_rate:.1f}% success rate)")
             
+            # Save the whole batch in one transaction (the updates are sent together)
+            try:
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error saving geocoding batch: {str(e)}")
+                db.session.rollback()
+            
             logger.info(f"Completed batch {i//actual_batch_size + 1}/{(total_facilities+actual_batch_size-1)//actual_batch_size}")
         
         logger.info(f"Geocoding complete. {total_success}/{total_facilities} facilities successfully geocoded.")
@@ -9,6 +9,7 @@ import math
 import re
 import logging
 import time
+import threading
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -24,6 +25,18 @@ GEOCODING_TIMEOUT = 3  # seconds
 GEOCODING_DELAY = 1.0  # seconds between requests
 MAX_FACILITIES_TO_GEOCODE = 30  # maximum number of facilities to geocode
 
+# One HTTP session per thread: consecutive Nominatim requests reuse the
+# keep-alive TLS connection instead of opening a new one each time
+_http = threading.local()
+
+def _nominatim_session():
+    """Return this thread's requests.Session for the geocoding API"""
+    session = getattr(_http, 'session', None)
+    if session is None:
+        session = _http.session = requests.Session()
+        session.headers['User-Agent'] = 'FindMyCure-Italia/1.0'
+    return session
+
 # Functions for address parsing and geocoding
 def parse_address(query_text):
     """
@@ -170,7 +183,7 @@ def geocode_address(address_components):
     
     try:
         # Add timeout to prevent hanging
-        response = requests.get(NOMINATIM_API, params=params, headers=headers, timeout=GEOCODING_TIMEOUT)
+        response = _nominatim_session().get(NOMINATIM_API, params=params, headers=headers, timeout=GEOCODING_TIMEOUT)
         results = response.json()
         
         if results and len(results) > 0:
@@ -401,7 +414,7 @@ def extract_coordinates_from_address(address, city=None):
     
     try:
         # Add timeout to prevent blocking the app
-        response = requests.get(NOMINATIM_API, params=params, headers=headers, timeout=GEOCODING_TIMEOUT)
+        response = _nominatim_session().get(NOMINATIM_API, params=params, headers=headers, timeout=GEOCODING_TIMEOUT)
         results = response.json()
         
         if results and len(results) > 0:
@@ -425,7 +438,9 @@ def find_facilities_near_address(query_text, facilities, max_distance=30.0, max_
     
     Args:
         query_text (str): The address query text
-        facilities (list): List of medical facilities
+        facilities (list or callable): List of medical facilities, or a function
+            called once the address is geocoded as facilities(lat, lon, max_distance, city_name)
+            returning the candidate facilities (city_name is the matched city, or None)
         max_distance (float): Maximum distance in kilometers (default: 30km)
         max_results (int): Maximum number of results to return (default: 50)
         
@@ -473,7 +488,7 @@ def find_facilities_near_address(query_text, facilities, max_distance=30.0, max_
         
         # Make the request
         try:
-            response = requests.get(
+            response = _nominatim_session().get(
                 NOMINATIM_API,
                 params=params,
                 headers=headers,
@@ -537,6 +552,10 @@ def find_facilities_near_address(query_text, facilities, max_distance=30.0, max_
     city_name = query_lower  # Use the normalized version from earlier
     is_city_search = is_known_city  # Use the result of our comprehensive city check from earlier
     
+    # Load only the candidate facilities now that the search point is known
+    if callable(facilities):
+        facilities = facilities(search_lat, search_lon, max_distance, city_name if is_city_search else None)
+    
     # Calculate distances for each facility that has coordinates
     facilities_with_distance = []
     facilities_without_coords = []
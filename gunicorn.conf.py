@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration
+
+Loaded automatically by `gunicorn main:app` from the project directory.
+Requests spend most of their time waiting on the database (and on Nominatim
+for address searches), so each worker serves several requests at once with
+threads instead of handling them one at a time.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Threaded workers: the waits on the database and on the geocoding API
+# overlap across requests without extra dependencies. Where gevent (and
+# psycogreen, for psycopg2) are installed, GUNICORN_WORKER_CLASS=gevent serves
+# many more concurrent requests per worker; raise DB_POOL_SIZE to match
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 200))
+
+
+def post_fork(server, worker):
+    """Make psycopg2 cooperative under gevent workers, so a query does not block the whole worker"""
+    if worker_class != "gevent":
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen is not installed: database queries will block gevent workers")
+        return
+    patch_psycopg()
+
+# Address searches may geocode on the fly; leave room before the worker is killed
+timeout = 120
+keepalive = 5
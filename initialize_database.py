@@ -99,8 +99,8 @@ def initialize_database(force=False):
                                     notes="Beginning database initialization",
                                     initialized_by="initialize_database.py")
         
-        # Clear existing data if necessary
-        if MedicalFacility.query.count() > 0 or force:
+        # Clear existing data if necessary (EXISTS stops at the first facility)
+        if force or db.session.query(MedicalFacility.query.exists()).scalar():
             if not clear_database():
                 logger.error("Failed to clear database. Aborting initialization.")
                 return False
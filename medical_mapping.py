@@ -4,6 +4,8 @@ This module provides functionality to map common medical conditions and symptoms
 to appropriate medical specialties, enabling more intuitive search.
 """
 
+from functools import lru_cache
+
 # Map of common medical conditions/symptoms to appropriate specialties
 # Format: 'condition_keyword': ['specialty1', 'specialty2', ...]
 CONDITION_TO_SPECIALTY_MAP = {
@@ -241,9 +243,18 @@ def map_query_to_specialties(query):
     if not query:
         return []
     
-    # Convert query to lowercase for case-insensitive matching
-    query = query.lower()
+    # Convert query to lowercase for case-insensitive matching; the normalized
+    # text is the cache key, so repeated searches skip the keyword scan
+    return list(_map_normalized_query(query.strip().lower()))
+
+@lru_cache(maxsize=4096)
+def _map_normalized_query(query):
+    """
+    Cached implementation of map_query_to_specialties for a lowercased, trimmed query.
     
+    Returns:
+        tuple: Specialty names (immutable, so the cached value cannot be modified by callers)
+    """
     # First try multi-word exact matches (e.g., "dolore al petto")
     matching_specialties = set()
     
@@ -281,4 +292,4 @@ def map_query_to_specialties(query):
             matching_specialties.update(['Medicina Interna', 'Medicina Generale', 'Ortopedia'])
     
     # Sort by relevance (this is a placeholder - ideally would sort based on query relevance)
-    return list(matching_specialties)
\ No newline at end of file
+    return tuple(matching_specialties)
@@ -3,6 +3,9 @@ Medical professionals to specialty mapping for FindMyCure Italia.
 This module provides functionality to map medical profession terms to specialties.
 """
 
+import re
+from functools import lru_cache
+
 # Map of medical profession terms to specialties
 # Format: 'profession_term': ['specialty1', 'specialty2', ...]
 PROFESSION_TO_SPECIALTY_MAP = {
@@ -152,6 +155,29 @@ PROFESSION_TO_SPECIALTY_MAP = {
     'visita': ['Medicina Generale'],
 }
 
+# Single-pass matcher for the profession terms contained in a text. The lookahead
+# reports a match at every position (overlapping terms included), and at each
+# position the alternation picks the term that comes first in the map
+_PROFESSION_ORDER = {term: index for index, term in enumerate(PROFESSION_TO_SPECIALTY_MAP)}
+_PROFESSION_PATTERN = re.compile(
+    '(?=(' + '|'.join(re.escape(term) for term in PROFESSION_TO_SPECIALTY_MAP) + '))'
+)
+
+def find_profession_term(text):
+    """
+    Find the profession term contained in a text.
+    
+    Args:
+        text (str): The lowercase text to scan
+        
+    Returns:
+        str: The first term (in PROFESSION_TO_SPECIALTY_MAP order) found in the text, or None
+    """
+    matches = _PROFESSION_PATTERN.findall(text)
+    if not matches:
+        return None
+    return min(matches, key=_PROFESSION_ORDER.__getitem__)
+
 def map_profession_to_specialties(query):
     """
     Map a medical profession query to relevant specialties.
@@ -165,8 +191,18 @@ def map_profession_to_specialties(query):
     if not query:
         return []
     
-    # Convert query to lowercase for case-insensitive matching
-    query_lower = query.lower()
+    # Convert query to lowercase for case-insensitive matching; the lowercased
+    # text is the cache key, so repeated searches skip the lookups
+    return list(_map_lowercase_profession_query(query.lower()))
+
+@lru_cache(maxsize=4096)
+def _map_lowercase_profession_query(query_lower):
+    """
+    Cached implementation of map_profession_to_specialties for a lowercased query.
+    
+    Returns:
+        tuple: Specialty names (immutable, so the cached value cannot be modified by callers)
+    """
     query_words = query_lower.split()
     
     # Find matching professions in the query
@@ -184,4 +220,4 @@ def map_profession_to_specialties(query):
                 for specialty in PROFESSION_TO_SPECIALTY_MAP[word]:
                     matching_specialties.add(specialty)
     
-    return list(matching_specialties)
\ No newline at end of file
+    return tuple(matching_specialties)
\ No newline at end of file
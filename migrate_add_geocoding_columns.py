@@ -17,29 +17,34 @@ def add_geocoding_columns():
         logger.info("Starting database migration to add geocoding columns...")
         
         try:
-            # Direct execution of ALTER TABLE statements
-            logger.info("Adding latitude column...")
-            db.session.execute(db.text(
-                "ALTER TABLE medical_facilities ADD COLUMN IF NOT EXISTS latitude FLOAT"
-            ))
+            # Add all columns with a single ALTER TABLE statement so the table
+            # lock and the catalog update are only taken once
+            columns = [
+                "latitude FLOAT",
+                "longitude FLOAT",
+                "geocoded BOOLEAN DEFAULT FALSE"
+            ]
+            clauses = ", ".join(f"ADD COLUMN IF NOT EXISTS {column}" for column in columns)
             
-            logger.info("Adding longitude column...")
-            db.session.execute(db.text(
-                "ALTER TABLE medical_facilities ADD COLUMN IF NOT EXISTS longitude FLOAT"
-            ))
+            # Run the DDL in an explicit transaction: committed on success,
+            # rolled back automatically on error
+            with db.engine.begin() as conn:
+                logger.info("Adding latitude, longitude and geocoded columns...")
+                conn.execute(db.text(f"ALTER TABLE medical_facilities {clauses}"))
             
-            logger.info("Adding geocoded column...")
-            db.session.execute(db.text(
-                "ALTER TABLE medical_facilities ADD COLUMN IF NOT EXISTS geocoded BOOLEAN DEFAULT FALSE"
-            ))
-            
-            # Commit the changes
-            db.session.commit()
+            # Build the coordinates index outside of any transaction so that
+            # reads on the table are not blocked while it is created
+            if db.engine.dialect.name == 'postgresql':
+                with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    logger.info("Creating index on latitude/longitude...")
+                    conn.execute(db.text(
+                        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_facility_coordinates "
+                        "ON medical_facilities (latitude, longitude)"
+                    ))
             
             logger.info("Migration completed successfully.")
         except Exception as e:
             logger.error(f"Error migrating database: {str(e)}")
-            db.session.rollback()
             raise
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+"""
+Migration Script to Add Indexes
+
+This script creates the indexes declared on the models for databases whose
+tables were created before the indexes were added (db.create_all() does not
+add indexes to tables that already exist).
+"""
+import logging
+from app import app, db
+import models
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_indexes():
+    """Create any missing index declared on the model tables"""
+    with app.app_context():
+        logger.info("Starting database migration to add indexes...")
+        
+        try:
+            # Trigram indexes need the pg_trgm extension
+            with db.engine.begin() as conn:
+                if conn.dialect.name == 'postgresql':
+                    conn.execute(models.PG_TRGM_EXTENSION)
+            
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    logger.info(f"Creating index {index.name} on {table.name} (if missing)...")
+                    index.create(bind=db.engine, checkfirst=True)
+            
+            logger.info("Migration completed successfully.")
+        except Exception as e:
+            logger.error(f"Error migrating database: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    add_indexes()
@@ -0,0 +1,63 @@
+"""
+Migration Script to Add the Denormalized Specialty Names
+
+This script adds the specialty_names column to the MedicalFacility table,
+installs the triggers that keep it in sync with facility_specialty, fills it
+for the existing facilities and creates its GIN index (PostgreSQL only).
+"""
+import logging
+from app import app, db
+import models
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_specialty_names():
+    """Add, fill and index the specialty_names column"""
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            logger.info("specialty_names only exists on PostgreSQL, nothing to do.")
+            return
+
+        logger.info("Starting database migration to add specialty_names...")
+
+        try:
+            with db.engine.begin() as conn:
+                logger.info("Adding specialty_names column...")
+                conn.execute(db.text(
+                    "ALTER TABLE medical_facilities ADD COLUMN IF NOT EXISTS specialty_names VARCHAR(100)[]"
+                ))
+
+                # Also replaces the per-row trigger of earlier versions
+                logger.info("Installing the facility_specialty triggers...")
+                conn.execute(models.SPECIALTY_NAMES_FUNCTION)
+                for drop_trigger in models.SPECIALTY_NAMES_DROP_TRIGGERS:
+                    conn.execute(drop_trigger)
+                for trigger in models.SPECIALTY_NAMES_TRIGGERS:
+                    conn.execute(trigger)
+
+                # Fill the column for the existing facilities in a single statement
+                logger.info("Filling specialty_names for the existing facilities...")
+                conn.execute(db.text("""
+                    UPDATE medical_facilities f
+                    SET specialty_names = ARRAY(
+                        SELECT s.name FROM facility_specialty fs
+                        JOIN specialties s ON s.id = fs.specialty_id
+                        WHERE fs.facility_id = f.id
+                        ORDER BY s.name
+                    )
+                """))
+
+            logger.info("Creating index ix_facility_specialty_names (if missing)...")
+            for index in models.MedicalFacility.__table__.indexes:
+                if index.name == 'ix_facility_specialty_names':
+                    index.create(bind=db.engine, checkfirst=True)
+
+            logger.info("Migration completed successfully.")
+        except Exception as e:
+            logger.error(f"Error migrating database: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    add_specialty_names()
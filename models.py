@@ -1,10 +1,81 @@
-from app import db
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, DateTime
+from app import app, db
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, DateTime, DDL, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 import datetime
 
+# Trigram indexes (gin_trgm_ops) let PostgreSQL answer ILIKE '%term%' lookups
+# from an index; the extension has to exist before they are created
+PG_TRGM_EXTENSION = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql')
+event.listen(db.metadata, 'before_create', PG_TRGM_EXTENSION)
+
+# The denormalized specialty_names column below only exists on PostgreSQL: it
+# is not mapped on other databases, whose tables never had it
+IS_POSTGRESQL = make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_backend_name() == 'postgresql'
+
+# medical_facilities.specialty_names is a denormalized copy of the facility's
+# specialty names, kept up to date by triggers on facility_specialty so the
+# search can filter on it without joining the specialty tables (PostgreSQL only).
+# The triggers fire once per statement and read the written rows from the
+# transition tables, so a bulk insert refreshes each facility once instead of
+# once per facility_specialty row
+SPECIALTY_NAMES_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION refresh_specialty_names() RETURNS trigger AS $$
+DECLARE
+    changed_ids integer[] := '{}';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        changed_ids := changed_ids || ARRAY(SELECT facility_id FROM new_rows);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        changed_ids := changed_ids || ARRAY(SELECT facility_id FROM old_rows);
+    END IF;
+    UPDATE medical_facilities f
+    SET specialty_names = ARRAY(
+        SELECT s.name FROM facility_specialty fs
+        JOIN specialties s ON s.id = fs.specialty_id
+        WHERE fs.facility_id = f.id
+        ORDER BY s.name
+    )
+    WHERE f.id = ANY(changed_ids);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""").execute_if(dialect='postgresql')
+# Transition tables need one trigger per event. The first name is the former
+# per-row trigger, dropped when the triggers are reinstalled
+SPECIALTY_NAMES_DROP_TRIGGERS = [
+    DDL(f"DROP TRIGGER IF EXISTS {name} ON facility_specialty").execute_if(dialect='postgresql')
+    for name in (
+        'trg_facility_specialty_names',
+        'trg_facility_specialty_names_insert',
+        'trg_facility_specialty_names_update',
+        'trg_facility_specialty_names_delete',
+    )
+]
+SPECIALTY_NAMES_TRIGGERS = [
+    DDL(
+        f"CREATE TRIGGER trg_facility_specialty_names_{event_name.lower()} "
+        f"AFTER {event_name} ON facility_specialty "
+        f"REFERENCING {transition_tables} "
+        "FOR EACH STATEMENT EXECUTE FUNCTION refresh_specialty_names()"
+    ).execute_if(dialect='postgresql')
+    for event_name, transition_tables in (
+        ('INSERT', 'NEW TABLE AS new_rows'),
+        ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+        ('DELETE', 'OLD TABLE AS old_rows'),
+    )
+]
+
 class Region(db.Model):
     __tablename__ = 'regions'
+    __table_args__ = (
+        db.Index(
+            'ix_region_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
@@ -16,6 +87,12 @@ class Region(db.Model):
 
 class Specialty(db.Model):
     __tablename__ = 'specialties'
+    __table_args__ = (
+        db.Index(
+            'ix_specialty_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
@@ -35,8 +112,38 @@ class FacilitySpecialty(db.Model):
     facility = relationship("MedicalFacility", back_populates="specialties")
     specialty = relationship("Specialty", back_populates="facilities")
 
+event.listen(FacilitySpecialty.__table__, 'after_create', SPECIALTY_NAMES_FUNCTION)
+for trigger in SPECIALTY_NAMES_TRIGGERS:
+    event.listen(FacilitySpecialty.__table__, 'after_create', trigger)
+
 class MedicalFacility(db.Model):
     __tablename__ = 'medical_facilities'
+    __table_args__ = (
+        # Partial index covering the "geocoded but missing coordinates" filter
+        # used by add_default_coordinates.py and its statistics
+        db.Index(
+            'ix_facility_missing_coords', 'geocoded',
+            postgresql_where=db.text('latitude IS NULL AND geocoded = TRUE'),
+            sqlite_where=db.text('latitude IS NULL AND geocoded = 1')
+        ),
+        # Trigram index answering the substring ILIKE '%term%' filters on the name
+        db.Index(
+            'ix_facility_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+        # Same for the city ILIKE '%city%' candidates of the city searches
+        db.Index(
+            'ix_facility_city_trgm', 'city',
+            postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+        # Bounding-box prefilter of the address searches (latitude BETWEEN ... AND
+        # longitude BETWEEN ...); also created by migrate_add_geocoding_columns.py
+        db.Index('ix_facility_coordinates', 'latitude', 'longitude'),
+        # Expression indexes backing the ORDER BY lower(name) / lower(coalesce(city, ''))
+        # of the name and city sorts
+        db.Index('ix_facility_name_lower', db.text('lower(name)')),
+        db.Index('ix_facility_city_lower', db.text("lower(coalesce(city, ''))")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -64,6 +171,10 @@ class MedicalFacility(db.Model):
     data_source = db.Column(db.String(100))
     attribution = db.Column(db.String(200))
     
+    # Denormalized specialty names (PostgreSQL only, maintained by trigger)
+    if IS_POSTGRESQL:
+        specialty_names = db.Column(ARRAY(db.String(100)), default=None)
+    
     # Relationships
     region = relationship("Region", back_populates="facilities")
     specialties = relationship("FacilitySpecialty", back_populates="facility", cascade="all, delete-orphan")
@@ -141,6 +252,11 @@ class MedicalFacility(db.Model):
         return None
 
 
+if IS_POSTGRESQL:
+    # GIN index for the specialty_names && ARRAY[...] overlap filter
+    db.Index('ix_facility_specialty_names', MedicalFacility.specialty_names, postgresql_using='gin')
+
+
 class DatabaseStatus(db.Model):
     """
     Tracks the status of database initialization and updates.
@@ -150,7 +266,8 @@ class DatabaseStatus(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     status = db.Column(db.String(50), nullable=False)  # initialized, updating, error
-    last_updated = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    # Indexed: get_status() reads the latest row (ORDER BY last_updated DESC LIMIT 1)
+    last_updated = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
     total_facilities = db.Column(db.Integer, default=0)
     total_regions = db.Column(db.Integer, default=0)
     total_specialties = db.Column(db.Integer, default=0)
@@ -162,6 +279,14 @@ class DatabaseStatus(db.Model):
         """Get the current database status"""
         return cls.query.order_by(cls.last_updated.desc()).first()
     
+    @classmethod
+    def get_version(cls):
+        """
+        Id of the latest status row. Every data change records a status, so the
+        web workers compare it to know when their cached reference data is stale
+        """
+        return db.session.query(db.func.max(cls.id)).scalar()
+    
     @classmethod
     def update_status(cls, status, total_facilities=None, total_regions=None, 
                      total_specialties=None, notes=None, initialized_by=None):
@@ -178,3 +303,37 @@ class DatabaseStatus(db.Model):
         db.session.add(new_status)
         db.session.commit()
         return new_status
+
+
+class BackgroundJob(db.Model):
+    """
+    A background process started from the admin pages (data loading, geocoding).
+    Stored in the database so that every web worker can report its status,
+    not only the one that started it.
+    """
+    __tablename__ = 'background_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(50), nullable=False)
+    log_file = db.Column(db.String(100))
+    details = db.Column(db.JSON, default=None)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, finished, failed
+    started_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    finished_at = db.Column(db.DateTime, default=None)
+    
+    @classmethod
+    def start(cls, job_id, kind, log_file, details=None):
+        """Record a job that is being started"""
+        job = cls(id=job_id, kind=kind, log_file=log_file, details=details, status='running')
+        db.session.add(job)
+        db.session.commit()
+        return job
+    
+    @classmethod
+    def finish(cls, job_id, succeeded):
+        """Record the outcome of a job, unless it was already recorded"""
+        cls.query.filter_by(id=job_id, status='running').update({
+            'status': 'finished' if succeeded else 'failed',
+            'finished_at': datetime.datetime.utcnow()
+        })
+        db.session.commit()